@@ -1,12 +1,15 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from . import models, schemas, database
+from starlette.concurrency import run_in_threadpool
+from . import models, schemas, database, crud
+from .passwords import pwd_context
+from .cache import LRUCache
 import os
 
 # Secret key configuration (in production, use environment variable)
@@ -14,8 +17,44 @@ SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+
+# Authenticated users are cached by token subject so most requests skip the
+# users-table lookup. Writes that change a user call invalidate_user(), which
+# only reaches this process: other workers or replicas may keep serving a
+# deactivated user for up to AUTH_CACHE_TTL. Admin access doesn't rely on the
+# cache; get_current_admin_user and admin_for_token re-read role and is_active.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+principal_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL, name="auth")
+
+@dataclass(frozen=True)
+class Principal:
+    # Detached, read-only view of a user; load the ORM row when you need to write
+    id: int
+    email: str
+    full_name: Optional[str]
+    age: Optional[int]
+    categoria_hyrox: Optional[models.HyroxCategory]
+    role: Optional[models.UserRole]
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            age=user.age,
+            categoria_hyrox=user.categoria_hyrox,
+            role=user.role,
+            is_active=bool(user.is_active),
+        )
+
+def invalidate_user(email: str):
+    principal_cache.pop(email)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -33,7 +72,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_session)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,9 +86,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = principal_cache.get(email)
     if user is None:
-        raise credentials_exception
+        db_user = await database.run(db, crud.get_user_by_email, email)
+        if db_user is None:
+            raise credentials_exception
+        user = Principal.from_user(db_user)
+        principal_cache.set(email, user)
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -57,13 +100,64 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         )
     return user
 
-async def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
-    if current_user.role != models.UserRole.ADMIN:
+async def get_current_admin_user(current_user: Principal = Depends(get_current_user),
+                                 db: Session = Depends(database.get_session)):
+    # Fresh row, not the cached principal: a demotion or deactivation made in another
+    # process must take effect at once
+    db_user = await database.run(db, crud.get_user_by_email, current_user.email)
+    user = Principal.from_user(db_user) if db_user is not None else None
+    if user is None:
+        principal_cache.pop(current_user.email)
+    else:
+        principal_cache.set(user.email, user)
+    if user is None or not user.is_active or user.role != models.UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have enough privileges",
         )
-    return current_user
+    return user
+
+def _load_principal(email: str) -> Optional[Principal]:
+    db = database.SessionLocal()
+    try:
+        db_user = crud.get_user_by_email(db, email)
+        return Principal.from_user(db_user) if db_user is not None else None
+    finally:
+        db.close()
+
+async def user_for_token(token: str) -> Optional[Principal]:
+    # Same checks as get_current_user, returning None instead of raising
+    try:
+        email = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    if email is None:
+        return None
+    user = principal_cache.get(email)
+    if user is None:
+        user = await run_in_threadpool(_load_principal, email)
+        if user is None:
+            return None
+        principal_cache.set(email, user)
+    return user if user.is_active else None
+
+async def admin_for_token(token: str) -> Optional[Principal]:
+    # Same checks as get_current_admin_user, for code outside the dependency system
+    try:
+        email = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    if email is None:
+        return None
+    user = await run_in_threadpool(_load_principal, email)
+    if user is None or not user.is_active or user.role != models.UserRole.ADMIN:
+        return None
+    principal_cache.set(email, user)
+    return user
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[Principal]:
+    # For public endpoints that allow more to logged-in users
+    return await user_for_token(token) if token else None
 
 class UpgradeRequest(BaseModel):
     new_role: str
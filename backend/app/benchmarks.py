@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+# In-memory benchmark registry.
+# The JSON file is parsed and validated once, then served from memory. A watcher
+# thread polls the file's mtime and swaps in a new snapshot atomically; a bad
+# file is logged and never replaces the last good copy.
+
+BENCHMARKS_PATH = os.getenv(
+    "BENCHMARKS_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "hyrox_benchmarks.json"),
+)
+BENCHMARKS_RELOAD_INTERVAL = float(os.getenv("BENCHMARKS_RELOAD_INTERVAL", "5"))
+
+DEFAULT_CATEGORY = "OPEN_M"
+STATION_KEYS = ("ski", "sled_push", "sled_pull", "burpees", "row", "farmers", "lunges", "wall_balls")
+REQUIRED_KEYS = STATION_KEYS + ("run_base",)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class CategoryBenchmarks:
+    ski: float
+    sled_push: float
+    sled_pull: float
+    burpees: float
+    row: float
+    farmers: float
+    lunges: float
+    wall_balls: float
+    run_base: float
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in REQUIRED_KEYS else default
+
+
+@dataclass(frozen=True)
+class BenchmarkSet:
+    categories: Mapping[str, CategoryBenchmarks]
+    version: str
+    mtime: float
+    loaded_at: float
+
+    def category(self, bench_key: str) -> CategoryBenchmarks:
+        return self.categories.get(bench_key, self.categories[DEFAULT_CATEGORY])
+
+    def as_dict(self) -> dict:
+        return {
+            key: {k: getattr(cat, k) for k in REQUIRED_KEYS}
+            for key, cat in self.categories.items()
+        }
+
+
+def _log(event: str, **fields):
+    # Structured single-line log on stderr, so CLI output on stdout stays clean
+    print(json.dumps({"event": event, **fields}, default=str), file=sys.stderr, flush=True)
+
+
+def parse_benchmarks(raw: bytes, mtime: float = 0.0) -> BenchmarkSet:
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise BenchmarkError(f"invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise BenchmarkError("top level must be an object")
+    if DEFAULT_CATEGORY not in data:
+        raise BenchmarkError(f"missing default category {DEFAULT_CATEGORY}")
+
+    categories = {}
+    for key, values in data.items():
+        if not isinstance(values, dict):
+            raise BenchmarkError(f"{key}: expected an object")
+        missing = [k for k in REQUIRED_KEYS if k not in values]
+        if missing:
+            raise BenchmarkError(f"{key}: missing keys {missing}")
+        for k in REQUIRED_KEYS:
+            v = values[k]
+            if isinstance(v, bool) or not isinstance(v, (int, float)) or v <= 0:
+                raise BenchmarkError(f"{key}.{k}: expected a positive number, got {v!r}")
+        categories[key] = CategoryBenchmarks(**{k: values[k] for k in REQUIRED_KEYS})
+
+    return BenchmarkSet(
+        categories=MappingProxyType(categories),
+        version=hashlib.sha256(raw).hexdigest()[:16],
+        mtime=mtime,
+        loaded_at=time.time(),
+    )
+
+
+class BenchmarkRegistry:
+    def __init__(self, path: str = BENCHMARKS_PATH, reload_interval: float = BENCHMARKS_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._current: Optional[BenchmarkSet] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners = []
+        self._failed_mtime: Optional[float] = None
+
+    @property
+    def version(self) -> Optional[str]:
+        current = self._current
+        return current.version if current else None
+
+    def on_reload(self, callback):
+        # callback(new_set) runs after every successful swap
+        self._listeners.append(callback)
+        return callback
+
+    def get(self) -> BenchmarkSet:
+        current = self._current
+        if current is None:
+            # Scripts/tests that never started the watcher load lazily once
+            current = self.reload()
+            if current is None:
+                raise BenchmarkError(f"benchmarks unavailable ({self.path})")
+        return current
+
+    def reload(self, force: bool = False) -> Optional[BenchmarkSet]:
+        with self._lock:
+            mtime = None
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if not force and self._current is not None and mtime == self._current.mtime:
+                    return self._current
+                if not force and mtime == self._failed_mtime:
+                    # Same broken file as last time; already logged
+                    return self._current
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                new_set = parse_benchmarks(raw, mtime)
+            except (OSError, BenchmarkError) as e:
+                self._failed_mtime = mtime
+                _log("benchmarks_load_error", path=self.path, error=str(e),
+                     kept_version=self.version)
+                return self._current
+
+            if self._current is not None and new_set.version == self._current.version:
+                # Touched but unchanged: keep the same object, just remember the mtime
+                new_set = BenchmarkSet(self._current.categories, self._current.version,
+                                       mtime, self._current.loaded_at)
+                self._current = new_set
+                return new_set
+
+            previous = self.version
+            self._current = new_set
+            _log("benchmarks_loaded", path=self.path, version=new_set.version,
+                 previous_version=previous, categories=sorted(new_set.categories))
+
+        for callback in self._listeners:
+            try:
+                callback(new_set)
+            except Exception as e:
+                _log("benchmarks_listener_error", error=str(e))
+        return new_set
+
+    def start_watching(self):
+        self.reload()
+        if self._watcher is not None or self.reload_interval <= 0:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="benchmarks-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=1)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            self.reload()
+
+
+registry = BenchmarkRegistry()
+
+
+def get_benchmarks() -> BenchmarkSet:
+    return registry.get()
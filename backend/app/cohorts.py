@@ -0,0 +1,534 @@
+import argparse
+import base64
+import gzip
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from . import database, models, simulation_codec
+
+# In-memory cohort index over saved simulations.
+# Per (bench category, athlete level) cohort, plus an all-levels cohort per
+# category, the finish times and each station's seconds are kept as sorted
+# arrays, so a percentile rank is a bisect and a quantile is an index lookup;
+# nothing reads json_resultados. Creates, deletes and imports queue their
+# change as they commit and an updater thread applies it, so request handlers
+# never wait on the index lock or an O(n) array insert. The index also keeps the
+# ids of its rows, which makes every change idempotent: changes made during a
+# rebuild or snapshot load are simply replayed onto the result.
+# The index is built in a background thread at startup, from a disk snapshot
+# when the snapshot still matches the table (row count, max id, sum of finish
+# times, packed rows) and by scanning the summary columns otherwise. A rebuild
+# scans and sorts without the lock and only takes it to swap the result in.
+# Snapshots are written after a rebuild and on shutdown.
+#
+# The index is per process. With several workers each one only sees its own
+# writes; its row count then drifts from the table, so no snapshot is written
+# and the next start rebuilds. Rebuild on demand: python -m app.cohorts rebuild
+
+COHORT_SNAPSHOT_PATH = os.getenv("COHORT_SNAPSHOT_PATH", "/tmp/hyrox-cohorts.snapshot")
+COHORT_SCAN_BATCH = int(os.getenv("COHORT_SCAN_BATCH", "5000"))
+SNAPSHOT_VERSION = 2
+
+ALL_LEVELS = "*"
+TOTAL = "total"
+STATION_NAMES = tuple(station["name"] for station in simulation_codec.STATIONS)
+QUANTILES = (5, 10, 25, 50, 75, 90, 95)
+MAX_BUCKETS = 100
+
+# (category, level, total seconds, station seconds or None)
+Entry = Tuple[str, str, int, Optional[Tuple[int, ...]]]
+
+
+class IndexNotReady(RuntimeError):
+    pass
+
+
+def _field(row, name):
+    return row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+
+
+def _station_seconds(packed, blob) -> Optional[Tuple[int, ...]]:
+    if packed is not None:
+        return tuple(simulation_codec.PACK_FORMAT.unpack(packed)[:len(STATION_NAMES)])
+    splits = blob.get("splits") if isinstance(blob, dict) else None
+    if not isinstance(splits, list) or len(splits) != len(STATION_NAMES):
+        return None
+    seconds = [s.get("suggested_time_seconds") if isinstance(s, dict) else None for s in splits]
+    if not all(type(v) is int and 0 <= v <= simulation_codec.MAX_PACKED_SECONDS for v in seconds):
+        return None
+    return tuple(seconds)
+
+
+def entry_for(row) -> Optional[Entry]:
+    # Simulation, column dict or result row -> index entry; None when it has no summary
+    category = _field(row, "bench_category")
+    total = _field(row, "total_seconds")
+    if not category or total is None or total < 0:
+        return None
+    stations = _station_seconds(_field(row, "splits_packed"), _field(row, "results_blob"))
+    return category, _field(row, "athlete_level") or "", int(total), stations
+
+
+def _remove(values: array, value: int) -> bool:
+    i = bisect_left(values, value)
+    if i < len(values) and values[i] == value:
+        del values[i]
+        return True
+    return False
+
+
+class Cohort:
+    __slots__ = ("totals", "stations")
+
+    def __init__(self, totals: Optional[array] = None, stations: Optional[List[array]] = None):
+        self.totals = totals if totals is not None else array("I")
+        self.stations = stations if stations is not None else [array("H") for _ in STATION_NAMES]
+
+    def add(self, total: int, stations: Optional[Tuple[int, ...]]):
+        insort(self.totals, total)
+        if stations:
+            for values, seconds in zip(self.stations, stations):
+                insort(values, seconds)
+
+    def remove(self, total: int, stations: Optional[Tuple[int, ...]]):
+        _remove(self.totals, total)
+        if stations:
+            for values, seconds in zip(self.stations, stations):
+                _remove(values, seconds)
+
+    def series(self, metric: int) -> array:
+        # metric: -1 for the finish time, else a station position
+        return self.totals if metric < 0 else self.stations[metric]
+
+    def __len__(self):
+        return len(self.totals)
+
+
+def _cohort_keys(category: str, level: str):
+    return (category, level), (category, ALL_LEVELS)
+
+
+class _Content:
+    # Cohorts plus the ids of the rows in them, so a change can be applied exactly
+    # once: adding a row that is already in, or removing one that isn't, is a no-op
+    def __init__(self, cohorts: Optional[Dict[tuple, Cohort]] = None, ids: Optional[array] = None):
+        self.cohorts = cohorts if cohorts is not None else {}
+        self.ids = ids if ids is not None else array("Q")
+
+    def apply(self, row_id: int, entry: Optional[Entry], adding: bool):
+        i = bisect_left(self.ids, row_id)
+        present = i < len(self.ids) and self.ids[i] == row_id
+        if adding == present:
+            return
+        if adding:
+            self.ids.insert(i, row_id)
+        else:
+            del self.ids[i]
+        if entry is None:
+            return
+        category, level, total, stations = entry
+        for key in _cohort_keys(category, level):
+            cohort = self.cohorts.get(key)
+            if adding:
+                if cohort is None:
+                    cohort = self.cohorts[key] = Cohort()
+                cohort.add(total, stations)
+            elif cohort is not None:
+                cohort.remove(total, stations)
+
+
+class _Build:
+    # A rebuild in progress: unsorted lists per cohort plus the scanned ids (in
+    # id order). Only the rebuild thread touches them; changes made meanwhile are
+    # replayed onto the result when it is swapped in.
+    def __init__(self):
+        self.totals: Dict[tuple, list] = {}
+        self.stations: Dict[tuple, List[list]] = {}
+        self.ids = array("Q")
+        self.deferred: list = []
+
+    def add(self, row_id: int, entry: Optional[Entry]):
+        self.ids.append(row_id)
+        if entry is None:
+            return
+        category, level, total, stations = entry
+        for key in _cohort_keys(category, level):
+            self.totals.setdefault(key, []).append(total)
+            if stations:
+                per_station = self.stations.setdefault(key, [[] for _ in STATION_NAMES])
+                for values, seconds in zip(per_station, stations):
+                    values.append(seconds)
+
+    def content(self) -> _Content:
+        cohorts = {}
+        for key, totals in self.totals.items():
+            per_station = self.stations.get(key) or [[] for _ in STATION_NAMES]
+            cohorts[key] = Cohort(array("I", sorted(totals)), [array("H", sorted(v)) for v in per_station])
+        return _Content(cohorts, self.ids)
+
+
+def _scan(after_id: int, limit: int) -> list:
+    s = models.Simulation
+    with database.engine.connect() as conn:
+        return conn.execute(
+            select(s.id, s.bench_category, s.athlete_level, s.total_seconds, s.splits_packed, s.results_blob)
+            .where(s.id > after_id)
+            .order_by(s.id)
+            .limit(limit)
+        ).all()
+
+
+def table_fingerprint() -> dict:
+    s = models.Simulation
+    with database.engine.connect() as conn:
+        row = conn.execute(select(
+            func.count(s.id), func.coalesce(func.max(s.id), 0),
+            func.coalesce(func.sum(s.total_seconds), 0), func.count(s.splits_packed),
+        )).one()
+    return {"rows": int(row[0]), "max_id": int(row[1]), "total_seconds_sum": int(row[2]), "packed_rows": int(row[3])}
+
+
+def _encode(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode()
+
+
+def _decode(typecode: str, encoded: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(encoded))
+    return values
+
+
+class CohortIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._content = _Content()
+        self._build: Optional[_Build] = None
+        # Changes made while a snapshot is loading, replayed once it is in place
+        self._pending: Optional[list] = None
+        self.ready = False
+        self.source = None
+        self.built_at = None
+        self.build_seconds = None
+        self._thread = None
+        self._rebuild_lock = threading.Lock()
+        # (row id, entry, adding), applied by the updater thread
+        self._changes: "queue.Queue[tuple]" = queue.Queue()
+        self._updater = None
+        self._updater_lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        return len(self._content.ids)
+
+    # --- Updates ---
+
+    def _enqueue(self, row, adding: bool):
+        # Called once the change has committed; rows without an id can't be tracked
+        row_id = _field(row, "id")
+        if row_id is None:
+            return
+        self._changes.put((row_id, entry_for(row), adding))
+        if self._updater is None:
+            with self._updater_lock:
+                if self._updater is None:
+                    self._updater = threading.Thread(target=self._run_updates, name="cohort-updates", daemon=True)
+                    self._updater.start()
+
+    def _run_updates(self):
+        while True:
+            change = self._changes.get()
+            try:
+                self._apply(*change)
+            except Exception as e:
+                print(f"--- COHORTS ERROR: {e} ---", flush=True)
+            finally:
+                self._changes.task_done()
+
+    def _apply(self, row_id: int, entry: Optional[Entry], adding: bool):
+        with self._lock:
+            # Replayed onto a build or snapshot when it is swapped in: whether or not the
+            # scan saw the change, replaying it gives the same result
+            if self._build is not None:
+                self._build.deferred.append((row_id, entry, adding))
+            if self._pending is not None:
+                self._pending.append((row_id, entry, adding))
+            if self.ready:
+                self._content.apply(row_id, entry, adding)
+
+    def add(self, row):
+        self._enqueue(row, True)
+
+    def add_many(self, rows):
+        for row in rows:
+            self._enqueue(row, True)
+
+    def remove(self, row):
+        self._enqueue(row, False)
+
+    def flush(self):
+        # Wait until every queued change has been applied
+        if self._updater is not None:
+            self._changes.join()
+
+    # --- Building ---
+
+    def rebuild(self) -> dict:
+        with self._rebuild_lock:
+            started = time.perf_counter()
+            build = _Build()
+            with self._lock:
+                self._build = build
+            try:
+                position = 0
+                while True:
+                    rows = _scan(position, COHORT_SCAN_BATCH)
+                    for row in rows:
+                        build.add(row.id, entry_for(row))
+                    if rows:
+                        position = rows[-1].id
+                    if len(rows) < COHORT_SCAN_BATCH:
+                        break
+                # Sorted outside the lock; only the swap holds it
+                content = build.content()
+                with self._lock:
+                    for change in build.deferred:
+                        content.apply(*change)
+                    self._install(content, "rebuild")
+                    self._build = None
+            finally:
+                with self._lock:
+                    self._build = None
+            self.build_seconds = round(time.perf_counter() - started, 3)
+        stats = self.stats()
+        print(f"--- COHORTS: rebuilt {stats['rows']} rows into {stats['cohorts']} cohorts "
+              f"in {self.build_seconds}s ---", flush=True)
+        return stats
+
+    def _install(self, content: _Content, source: str):
+        # Caller holds the lock
+        self._content = content
+        self.source = source
+        self.built_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.ready = True
+
+    def load_snapshot(self, path: str = COHORT_SNAPSHOT_PATH) -> bool:
+        try:
+            with gzip.open(path, "rt") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("byteorder") != sys.byteorder \
+                or snapshot.get("stations") != list(STATION_NAMES):
+            return False
+        with self._lock:
+            self._pending = []
+        try:
+            if snapshot.get("fingerprint") != table_fingerprint():
+                print("--- COHORTS: snapshot is stale, rebuilding ---", flush=True)
+                return False
+            cohorts = {
+                (item["category"], item["level"]):
+                    Cohort(_decode("I", item["totals"]), [_decode("H", v) for v in item["stations"]])
+                for item in snapshot["cohorts"]
+            }
+            content = _Content(cohorts, _decode("Q", snapshot["ids"]))
+            with self._lock:
+                for change in self._pending:
+                    content.apply(*change)
+                self._install(content, "snapshot")
+        finally:
+            with self._lock:
+                self._pending = None
+        print(f"--- COHORTS: loaded {self.rows} rows from snapshot {path} ---", flush=True)
+        return True
+
+    def save_snapshot(self, path: str = COHORT_SNAPSHOT_PATH) -> bool:
+        if not self.ready:
+            return False
+        self.flush()
+        fingerprint = table_fingerprint()
+        with self._lock:
+            if fingerprint["rows"] != self.rows:
+                # Another process wrote to the table: this index isn't the whole picture
+                print(f"--- COHORTS: index has {self.rows} rows, table has {fingerprint['rows']}; "
+                      f"snapshot skipped ---", flush=True)
+                return False
+            # Copies (memcpy) under the lock; encoding happens outside it
+            ids = self._content.ids[:]
+            copies = [(key, cohort.totals[:], [v[:] for v in cohort.stations])
+                      for key, cohort in self._content.cohorts.items()]
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "byteorder": sys.byteorder,
+            "stations": list(STATION_NAMES),
+            "fingerprint": fingerprint,
+            "ids": _encode(ids),
+            "cohorts": [
+                {
+                    "category": category,
+                    "level": level,
+                    "totals": _encode(totals),
+                    "stations": [_encode(v) for v in stations],
+                }
+                for (category, level), totals, stations in copies
+            ],
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+        return True
+
+    def load(self):
+        try:
+            if not self.load_snapshot():
+                self.rebuild()
+                self.save_snapshot()
+        except Exception as e:
+            print(f"--- COHORTS ERROR: {e} ---", flush=True)
+
+    def start(self):
+        # Background load so startup isn't blocked by a full scan
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.load, name="cohort-index", daemon=True)
+        self._thread.start()
+
+    def rebuild_in_background(self) -> bool:
+        if self._thread is not None and self._thread.is_alive():
+            return False
+
+        def run():
+            try:
+                self.rebuild()
+                self.save_snapshot()
+            except Exception as e:
+                print(f"--- COHORTS ERROR: {e} ---", flush=True)
+
+        self._thread = threading.Thread(target=run, name="cohort-index", daemon=True)
+        self._thread.start()
+        return True
+
+    # --- Queries ---
+
+    def _cohort(self, category: str, level: Optional[str]) -> Optional[Cohort]:
+        if not self.ready:
+            raise IndexNotReady("Cohort index is loading")
+        return self._content.cohorts.get((category, level if level is not None else ALL_LEVELS))
+
+    def percentile(self, category: str, level: Optional[str], metric: int, seconds: int) -> dict:
+        with self._lock:
+            cohort = self._cohort(category, level)
+            values = cohort.series(metric) if cohort is not None else ()
+            n = len(values)
+            faster = bisect_left(values, seconds)
+            slower = n - bisect_right(values, seconds)
+        return {
+            "cohort_size": n,
+            "seconds": seconds,
+            "faster_plans": faster,
+            "slower_plans": slower,
+            # Mid-rank: ties count half
+            "percentile": round((faster + (n - faster - slower) / 2) / n * 100, 2) if n else None,
+            "faster_than_pct": round(slower / n * 100, 2) if n else None,
+        }
+
+    def distribution(self, category: str, level: Optional[str], metric: int, buckets: int = 20) -> dict:
+        buckets = max(1, min(buckets, MAX_BUCKETS))
+        with self._lock:
+            cohort = self._cohort(category, level)
+            values = cohort.series(metric) if cohort is not None else ()
+            n = len(values)
+            if not n:
+                return {"cohort_size": 0, "min": None, "max": None, "quantiles": {}, "histogram": []}
+            low, high = values[0], values[-1]
+            quantiles = {f"p{q}": values[min(n - 1, max(0, -(-q * n // 100) - 1))] for q in QUANTILES}
+            width = max(1, -(-(high - low + 1) // buckets))
+            histogram = []
+            start = low
+            while start <= high:
+                end = start + width
+                count = bisect_left(values, end) - bisect_left(values, start)
+                histogram.append({"from_seconds": start, "to_seconds": end, "count": count})
+                start = end
+        return {"cohort_size": n, "min": low, "max": high, "quantiles": quantiles, "histogram": histogram}
+
+    def compare(self, row) -> Optional[dict]:
+        # A saved simulation against its own cohort: finish time and each station
+        entry = entry_for(row)
+        if entry is None:
+            return None
+        category, level, total, stations = entry
+        result = {
+            "bench_category": category,
+            "athlete_level": level or None,
+            "finish": self.percentile(category, level, -1, total),
+            "stations": [],
+        }
+        if stations:
+            for position, (name, seconds) in enumerate(zip(STATION_NAMES, stations)):
+                result["stations"].append({"station": name, **self.percentile(category, level, position, seconds)})
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "loading": self._build is not None or self._pending is not None,
+                "source": self.source,
+                "built_at": self.built_at,
+                "build_seconds": self.build_seconds,
+                "rows": self.rows,
+                "cohorts": len(self._content.cohorts),
+                "sizes": {f"{c}/{l}": len(cohort) for (c, l), cohort in sorted(self._content.cohorts.items())},
+                "queued_changes": self._changes.qsize(),
+                "snapshot_path": COHORT_SNAPSHOT_PATH,
+            }
+
+
+def metric_position(metric: Optional[str]) -> int:
+    # "total" (default), a station name (case-insensitive) or its position in the race
+    if metric is None or metric.lower() == TOTAL:
+        return -1
+    if metric.isdigit() and int(metric) < len(STATION_NAMES):
+        return int(metric)
+    lowered = metric.lower()
+    for position, name in enumerate(STATION_NAMES):
+        if name.lower() == lowered or name.lower().split(" (")[0] == lowered:
+            return position
+    raise ValueError(f"Unknown metric '{metric}' (expected 'total', a station name or 0-{len(STATION_NAMES) - 1})")
+
+
+index = CohortIndex()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the cohort percentile index snapshot")
+    parser.add_argument("command", nargs="?", default="rebuild", choices=("rebuild", "status"))
+    parser.add_argument("--snapshot", default=COHORT_SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        ok = index.load_snapshot(args.snapshot)
+        print(json.dumps({"snapshot_valid": ok, **index.stats()}, indent=2))
+        return
+    index.rebuild()
+    if not index.save_snapshot(args.snapshot):
+        sys.exit(1)
+    print(f"--- COHORTS: snapshot written to {args.snapshot} ---", flush=True)
+
+
+if __name__ == "__main__":
+    main()
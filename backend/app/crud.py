@@ -0,0 +1,103 @@
+from typing import List, Optional, Tuple
+import uuid
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, load_only
+from . import models, pagination, simulation_codec
+
+# Synchronous ORM operations used by the request handlers.
+# Handlers call them through database.run(), which executes them in the
+# threadpool (sync mode) or on the AsyncSession's greenlet bridge (async mode).
+# Every function leaves the returned objects fully loaded, because attributes
+# are read later outside the session's I/O context.
+
+def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def get_user(db: Session, user_id: int) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.id == user_id).first()
+
+def create_user(db: Session, **fields) -> models.User:
+    user = models.User(**fields)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def update_user(db: Session, user: models.User, **fields) -> models.User:
+    for name, value in fields.items():
+        setattr(user, name, value)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def create_simulation(db: Session, user_id: int, tempo_alvo: str, json_resultados: dict,
+                      categoria_hyrox: Optional[str] = None) -> models.Simulation:
+    sim = models.Simulation(
+        user_id=user_id,
+        tempo_alvo=tempo_alvo,
+        share_token=str(uuid.uuid4())
+    )
+    simulation_codec.store(sim, json_resultados, categoria_hyrox)
+    db.add(sim)
+    db.commit()
+    db.refresh(sim)
+    return sim
+
+def get_user_simulation(db: Session, simulation_id: int, user_id: int) -> Optional[models.Simulation]:
+    return db.query(models.Simulation).filter(models.Simulation.id == simulation_id, models.Simulation.user_id == user_id).first()
+
+def get_simulation_by_share_token(db: Session, token: str) -> Optional[models.Simulation]:
+    return db.query(models.Simulation).filter(models.Simulation.share_token == token).first()
+
+SIMULATION_SUMMARY_COLUMNS = (
+    models.Simulation.id,
+    models.Simulation.user_id,
+    models.Simulation.tempo_alvo,
+    models.Simulation.created_at,
+    models.Simulation.share_token,
+)
+
+def list_simulations(db: Session, user_id: int, limit: int = pagination.DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                     summary: bool = False) -> Tuple[List[models.Simulation], Optional[str]]:
+    query = db.query(models.Simulation).filter(models.Simulation.user_id == user_id)
+    if summary:
+        # Leave the json_resultados blob out of the SELECT entirely
+        query = query.options(load_only(*SIMULATION_SUMMARY_COLUMNS))
+    return pagination.newest_first(query, models.Simulation, cursor, limit)
+
+def delete_simulation(db: Session, simulation_id: int, user_id: int) -> Optional[models.Simulation]:
+    sim = db.query(models.Simulation).filter(models.Simulation.id == simulation_id, models.Simulation.user_id == user_id).first()
+    if sim:
+        db.delete(sim)
+        db.commit()
+    return sim
+
+def insert_simulations(db: Session, rows: List[dict]) -> int:
+    # Bulk insert of prepared column dicts in one transaction (multi-row INSERT)
+    db.execute(insert(models.Simulation), rows)
+    db.commit()
+    return len(rows)
+
+def simulation_ids_by_share_token(db: Session, tokens: List[str]) -> dict:
+    # Bulk inserts don't return ids; share_token is unique
+    if not tokens:
+        return {}
+    return dict(db.query(models.Simulation.share_token, models.Simulation.id)
+                .filter(models.Simulation.share_token.in_(tokens)).all())
+
+def create_recovery_log(db: Session, user_id: int, **fields) -> models.RecoveryLog:
+    log = models.RecoveryLog(user_id=user_id, **fields)
+    db.add(log)
+    db.commit()
+    db.refresh(log)
+    return log
+
+def list_recovery_logs(db: Session, user_id: int, limit: int = pagination.DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None) -> Tuple[List[models.RecoveryLog], Optional[str]]:
+    query = db.query(models.RecoveryLog).filter(models.RecoveryLog.user_id == user_id)
+    return pagination.newest_first(query, models.RecoveryLog, cursor, limit)
+
+def insert_recovery_logs(db: Session, rows: List[dict]) -> int:
+    db.execute(insert(models.RecoveryLog), rows)
+    db.commit()
+    return len(rows)
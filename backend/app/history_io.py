@@ -0,0 +1,154 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Tuple
+
+from pydantic import ValidationError
+
+from . import cohorts, crud, database, models, schemas, simulation_codec
+
+# Bulk history export/import as NDJSON, one record per line.
+# Export streams rows through a server-side cursor (yield_per) on its own sync
+# session, so memory stays flat however long the history is. Import reads the
+# request body incrementally, validates each line on its own and inserts valid
+# rows in multi-row batches, one transaction per batch; bad lines are reported
+# by line number and skipped.
+
+EXPORT_YIELD_PER = int(os.getenv("HISTORY_EXPORT_YIELD_PER", "1000"))
+EXPORT_ROWS_PER_CHUNK = 200
+IMPORT_BATCH_SIZE = int(os.getenv("HISTORY_IMPORT_BATCH_SIZE", "500"))
+MAX_IMPORT_LINE_BYTES = int(os.getenv("HISTORY_IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+MAX_REPORTED_ERRORS = 100
+MEDIA_TYPE = "application/x-ndjson"
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+def _simulation_row(user_id: int, item: schemas.SimulationImport) -> dict:
+    return {
+        "user_id": user_id,
+        "tempo_alvo": item.tempo_alvo,
+        "created_at": item.created_at or datetime.utcnow(),
+        "share_token": str(uuid.uuid4()),
+        **simulation_codec.columns(item.json_resultados, item.categoria_hyrox),
+    }
+
+
+def _recovery_log_row(user_id: int, item: schemas.RecoveryLogImport) -> dict:
+    return {
+        "user_id": user_id,
+        "intensity": item.intensity,
+        "protocol_name": item.protocol_name,
+        "duration_minutes": item.duration_minutes,
+        "created_at": item.created_at or datetime.utcnow(),
+    }
+
+
+async def _index_simulations(db, rows: List[dict]):
+    ids = await database.run(db, crud.simulation_ids_by_share_token, [row["share_token"] for row in rows])
+    cohorts.index.add_many([{**row, "id": ids.get(row["share_token"])} for row in rows])
+
+
+# kind -> (model, export schema, import schema, row builder, bulk insert, after-insert hook)
+KINDS = {
+    "simulations": (models.Simulation, schemas.SimulationResponse, schemas.SimulationImport,
+                    _simulation_row, crud.insert_simulations, _index_simulations),
+    "recovery_logs": (models.RecoveryLog, schemas.RecoveryLogResponse, schemas.RecoveryLogImport,
+                      _recovery_log_row, crud.insert_recovery_logs, None),
+}
+
+
+def iter_export(kind: str, user_id: int) -> Iterator[str]:
+    model, response_schema = KINDS[kind][:2]
+    db = database.SessionLocal()
+    try:
+        rows = (
+            db.query(model)
+            .filter(model.user_id == user_id)
+            .order_by(model.id)
+            .yield_per(EXPORT_YIELD_PER)
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(response_schema.model_validate(row).model_dump_json() + "\n")
+            if len(chunk) >= EXPORT_ROWS_PER_CHUNK:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+    finally:
+        db.close()
+
+
+async def iter_lines(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    # (line number, line) from a chunked body, holding at most one partial line
+    buffer = b""
+    line_no = 0
+    async for chunk in body:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(buffer) > MAX_IMPORT_LINE_BYTES:
+            raise LineTooLong(f"Line {line_no + 1} exceeds {MAX_IMPORT_LINE_BYTES} bytes")
+    if buffer:
+        yield line_no + 1, buffer
+
+
+async def import_ndjson(kind: str, body: AsyncIterator[bytes], db, user_id: int) -> dict:
+    import_schema, build_row, insert_rows, after_insert = KINDS[kind][2:]
+    result = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(line_no: int, message: str):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"line": line_no, "error": message})
+
+    async def flush(batch):
+        rows = [row for _, row in batch]
+        try:
+            inserted = await database.run(db, insert_rows, rows)
+        except Exception as e:
+            await database.run(db, lambda session: session.rollback())
+            if len(batch) == 1:
+                fail(batch[0][0], f"Insert failed: {e.__class__.__name__}")
+                return
+            # Retry row by row to pin the failure on the offending lines
+            for entry in batch:
+                await flush([entry])
+            return
+        result["imported"] += inserted
+        if after_insert is not None:
+            # The rows are committed: a failure here must not retry (and duplicate) them
+            try:
+                await after_insert(db, rows)
+            except Exception as e:
+                print(f"--- IMPORT ERROR: after-insert hook for {kind} failed: {e} ---", flush=True)
+
+    batch = []
+    try:
+        async for line_no, line in iter_lines(body):
+            if not line.strip():
+                continue
+            try:
+                item = import_schema.model_validate(json.loads(line))
+                batch.append((line_no, build_row(user_id, item)))
+            except (ValueError, ValidationError) as e:
+                if isinstance(e, ValidationError):
+                    message = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}" for err in e.errors())
+                else:
+                    message = str(e)
+                fail(line_no, message)
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+    except LineTooLong as e:
+        result["aborted"] = str(e)
+    if batch:
+        await flush(batch)
+    return result
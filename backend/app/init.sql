@@ -12,7 +12,9 @@ CREATE TABLE IF NOT EXISTS users (
     categoria_hyrox ENUM('Open', 'Pro', 'Doubles', 'Single Open', 'Single Pro', 'Doubles Men', 'Doubles Women', 'Doubles Pro') DEFAULT 'Open',
     role ENUM('admin', 'user', 'pro', 'coach') DEFAULT 'user',
     is_active BOOLEAN DEFAULT TRUE,
-    INDEX (email)
+    INDEX (email),
+    INDEX ix_users_role_id (role, id),
+    FULLTEXT INDEX ft_users_full_name (full_name) WITH PARSER ngram
 );
 
 -- Simulations table
@@ -21,10 +23,18 @@ CREATE TABLE IF NOT EXISTS simulations (
     user_id INT,
     tempo_alvo VARCHAR(50),
     json_resultados JSON,
+    splits_packed VARBINARY(64),
+    results_extra JSON,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     share_token VARCHAR(100) UNIQUE,
+    total_seconds INT,
+    bench_category VARCHAR(20),
+    athlete_level VARCHAR(50),
     FOREIGN KEY (user_id) REFERENCES users(id),
-    INDEX (share_token)
+    INDEX (share_token),
+    INDEX ix_simulations_user_created (user_id, created_at, id),
+    INDEX ix_simulations_total_seconds (total_seconds),
+    INDEX ix_simulations_cohort (bench_category, athlete_level, total_seconds)
 );
 
 -- Recovery logs table
@@ -35,7 +45,8 @@ CREATE TABLE IF NOT EXISTS recovery_logs (
     protocol_name VARCHAR(255),
     duration_minutes INT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id)
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_recovery_logs_user_created (user_id, created_at, id)
 );
 
 -- Seed System Admin if not exists
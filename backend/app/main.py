@@ -1,40 +1,15 @@
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, HTTPException, status, APIRouter, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from datetime import timedelta
 from typing import List, Optional
-import uuid
-from . import models, database, schemas, auth, pacer
-from fastapi.staticfiles import StaticFiles
+import hmac
 import os
-
-# Create tables
-def migrate_schema():
-    try:
-        print("--- STARTING SCHEMA MIGRATION ---", flush=True)
-        with database.engine.begin() as conn:
-            # Check for columns in users table
-            result = conn.execute(text("SHOW COLUMNS FROM users"))
-            existing_columns = [row[0] for row in result.fetchall()]
-            
-            # Columns to check and add
-            required_columns = {
-                "full_name": "VARCHAR(255)",
-                "age": "INTEGER",
-                "categoria_hyrox": "VARCHAR(50)",
-                "role": "VARCHAR(50)",
-                "is_active": "BOOLEAN DEFAULT TRUE"
-            }
-            
-            for col, col_type in required_columns.items():
-                if col not in existing_columns:
-                    print(f"--- MIGRATION: Adding missing column '{col}' ---", flush=True)
-                    conn.execute(text(f"ALTER TABLE users ADD COLUMN {col} {col_type}"))
-    except Exception as e:
-        print(f"--- MIGRATION ERROR: {e} ---", flush=True)
+import uuid
+from . import models, database, crud, schemas, auth, responses, pacer, pacer_batch, pacer_cache, pacer_sweep, montecarlo, pace_grid, partner, benchmarks, passwords, pagination, user_search, share_cache, history_io, migrations, static_files, metrics, profiling, cohorts
 
 app = FastAPI(title="Hyrox Pacer Pro API")
 
@@ -45,51 +20,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, pagination.TOTAL_COUNT_HEADER, pagination.TOTAL_ESTIMATE_HEADER,
+                    pagination.TOTAL_CAPPED_HEADER],
 )
+# Opt-in only: when disabled the middleware isn't installed at all
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Added last so it wraps the others and latency includes every other middleware
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+# Everything below is exported on /metrics
+metrics.instrument_engine(database.engine, "sync")
+if database.async_engine is not None:
+    metrics.instrument_engine(database.async_engine.sync_engine, "async")
+for _cache in (pacer_cache.cache, partner.plan_cache, auth.principal_cache, share_cache.cache):
+    metrics.register_cache(_cache)
+metrics.register_stats("db_pool", database.pool_stats,
+                       gauges=("size", "checked_out", "idle", "overflow"),
+                       counters=("connects", "checkouts", "invalidations", "timeouts"),
+                       labels=lambda s: {"pool": s["name"]})
+metrics.register_stats("password_hasher", passwords.hasher.stats,
+                       gauges=("pending",), counters=("completed", "rejected", "rehashed"))
 
 # Create API Router
 api_router = APIRouter(prefix="/api")
 
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "benchmarks_version": benchmarks.registry.version}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    if not metrics.METRICS_TOKEN:
+        # Fail closed: not exposed unless a token is configured or it's explicitly public
+        if not metrics.METRICS_PUBLIC:
+            raise HTTPException(status_code=404, detail="Not Found")
+    elif not hmac.compare_digest(request.headers.get("authorization", "").encode(),
+                                 f"Bearer {metrics.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.on_event("startup")
 def startup_event():
-    try:
-        migrate_schema()
-        models.Base.metadata.create_all(bind=database.engine)
-        
-        db = database.SessionLocal()
-        try:
-            admin_email = "admin@hyrox.com"
-            admin = db.query(models.User).filter(models.User.email == admin_email).first()
-            if not admin:
-                hashed_password = auth.get_password_hash("admin123")
-                new_admin = models.User(
-                    email=admin_email,
-                    password_hash=hashed_password,
-                    full_name="System Admin",
-                    role=models.UserRole.ADMIN,
-                    is_active=True
-                )
-                db.add(new_admin)
-                db.commit()
-                print("--- SEED: Admin user created ---", flush=True)
-        finally:
-            db.close()
-            
-    except Exception as e:
-        print(f"--- STARTUP ERROR: {e} ---", flush=True)
+    # Parse benchmarks once and watch the file for changes
+    benchmarks.registry.start_watching()
+    # Built frontend into memory (hashes + gzip/brotli variants)
+    static_files.manifest.load(static_files.STATIC_PATH)
+    # One ledger query when the schema is already at head. A MigrationError (edited
+    # or unknown migration, lock timeout) aborts startup instead of serving a half-migrated schema
+    applied = migrations.upgrade(database.engine)
+    if applied:
+        print(f"--- MIGRATIONS: applied {applied} ---", flush=True)
+    # Worker processes come from a forkserver, so they don't inherit this process's threads
+    montecarlo.start_pool()
+    # Snapshot or full scan, in the background; cohort endpoints answer 503 until ready
+    cohorts.index.start()
 
 @api_router.post("/signup", response_model=schemas.UserResponse)
-def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def signup(user: schemas.UserCreate, db: Session = Depends(database.get_session)):
+    db_user = await database.run(db, crud.get_user_by_email, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
-    new_user = models.User(
+    hashed_password = await passwords.hasher.hash(user.password)
+    new_user = await database.run(
+        db,
+        crud.create_user,
         email=user.email,
         password_hash=hashed_password,
         full_name=user.full_name,
@@ -97,20 +99,21 @@ def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         categoria_hyrox=user.categoria_hyrox,
         role=user.role 
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
     return new_user
 
 @api_router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_session)):
+    user = await database.run(db, crud.get_user_by_email, form_data.username)
+    valid, new_hash = await passwords.hasher.verify_and_update(form_data.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash used different bcrypt rounds; upgrade it while we have the password
+        user = await database.run(db, crud.update_user, user, password_hash=new_hash)
     
     if not user.is_active:
         raise HTTPException(
@@ -131,170 +134,476 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @api_router.get("/users/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+async def read_users_me(current_user: auth.Principal = Depends(auth.get_current_user)):
     return current_user
 
-@api_router.post("/calculate-pacer")
-def calculate_pacer(request: schemas.PacerRequest):
+@api_router.post("/calculate-pacer", response_class=responses.PacerJSONResponse)
+def calculate_pacer(request: schemas.PacerRequest, http_request: Request):
     try:
-        result = pacer.calculate_splits(
+        args = (
             request.tempo_alvo, 
             request.categoria_hyrox, 
             request.preferred_run_pace,
             request.roxzone_minutes,
             request.is_elite,
-            request.athlete_level
+            request.athlete_level,
+            request.pacing_mode
         )
-        return result
+        key = pacer_cache.cache_key(*args)
+        etag = pacer_cache.etag_for(key, request.tempo_alvo, request.athlete_level)
+        if etag_matches(http_request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        result = pacer_cache.calculate_splits(*args, key=key)
+        return responses.PacerJSONResponse(result, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@api_router.post("/simulations", response_model=schemas.SimulationResponse)
-def create_simulation(simulation: schemas.SimulationCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    db_sim = models.Simulation(
-        user_id=current_user.id,
-        tempo_alvo=simulation.tempo_alvo,
-        json_resultados=simulation.json_resultados,
-        share_token=str(uuid.uuid4())
+@api_router.post("/calculate-pacer/batch", response_class=responses.PacerJSONResponse)
+def calculate_pacer_batch(request: schemas.PacerBatchRequest):
+    items = request.items
+    try:
+        results = pacer_batch.calculate_splits_batch(
+            [r.tempo_alvo for r in items],
+            [r.categoria_hyrox for r in items],
+            [r.preferred_run_pace for r in items],
+            [r.roxzone_minutes for r in items],
+            [r.is_elite for r in items],
+            [r.athlete_level for r in items],
+            [r.pacing_mode for r in items]
+        )
+        return responses.PacerJSONResponse({"results": results})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/pacer/sweep")
+def sweep_pacer(request: schemas.PacerSweepRequest):
+    try:
+        return pacer_sweep.sweep(
+            request.base.model_dump(),
+            [axis.model_dump() for axis in request.axes],
+            reconcile=request.reconcile
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/pacer/partner-strategy")
+def optimize_partner_strategy(request: schemas.PartnerOptimizeRequest):
+    try:
+        return partner.optimize(
+            request.partner_a.model_dump(),
+            request.partner_b.model_dump(),
+            request.categoria_hyrox,
+            request.roxzone_minutes,
+            request.transition_seconds,
+            request.switches_per_shared_station,
+            request.fatigue_rate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/pacer/simulate")
+async def simulate_pacer(request: schemas.PacerSimulationRequest,
+                         current_user: Optional[auth.Principal] = Depends(auth.get_optional_user)):
+    if current_user is None and request.trials > montecarlo.MONTECARLO_ANONYMOUS_MAX_TRIALS:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Log in to run more than {montecarlo.MONTECARLO_ANONYMOUS_MAX_TRIALS} trials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        plan = pacer_cache.calculate_splits(
+            request.tempo_alvo,
+            request.categoria_hyrox,
+            request.preferred_run_pace,
+            request.roxzone_minutes,
+            request.is_elite,
+            request.athlete_level,
+            request.pacing_mode
+        )
+        template = pacer.get_template(plan["bench_category"], request.athlete_level, request.is_elite)
+        return await montecarlo.simulate(
+            plan,
+            template,
+            pacer.parse_time_to_seconds(request.tempo_alvo),
+            request.trials,
+            seed=request.seed,
+            station_cv=request.station_cv,
+            run_cv=request.run_cv,
+            roxzone_cv=request.roxzone_cv,
+            fatigue_sd=request.fatigue_sd
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/pacer/grid")
+def export_pace_grid(
+    request: Request,
+    format: str = "csv",
+    start: str = pace_grid.DEFAULT_START,
+    end: str = pace_grid.DEFAULT_END,
+    step: int = pace_grid.DEFAULT_STEP_SECONDS,
+    categories: str = ",".join(pace_grid.DEFAULT_CATEGORIES),
+    levels: str = ",".join(pace_grid.DEFAULT_LEVELS),
+    preferred_run_pace: Optional[str] = None,
+    roxzone_minutes: Optional[float] = None,
+    pacing_mode: str = "heuristic"
+):
+    try:
+        if pacing_mode not in pacer.PACING_MODES:
+            raise ValueError(f"Invalid pacing_mode '{pacing_mode}'")
+        rows = pace_grid.iter_export(
+            format,
+            start=start,
+            end=end,
+            step_seconds=step,
+            categories=[c.strip() for c in categories.split(",") if c.strip()],
+            levels=[lvl.strip() for lvl in levels.split(",") if lvl.strip()],
+            preferred_run_pace=preferred_run_pace,
+            roxzone_minutes=roxzone_minutes,
+            pacing_mode=pacing_mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        # Stop generating as soon as the client goes away
+        async for chunk in iterate_in_threadpool(rows):
+            if await request.is_disconnected():
+                break
+            yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type=pace_grid.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="pace-grid.{format}"'}
     )
-    db.add(db_sim)
-    db.commit()
-    db.refresh(db_sim)
+
+@api_router.post("/simulations", response_model=schemas.SimulationResponse)
+async def create_simulation(simulation: schemas.SimulationCreate, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    db_sim = await database.run(db, crud.create_simulation, current_user.id, simulation.tempo_alvo, simulation.json_resultados,
+                                simulation.categoria_hyrox)
+    cohorts.index.add(db_sim)
     return db_sim
 
 @api_router.get("/share/{token}", response_model=schemas.SimulationResponse)
-def get_shared_simulation(token: str, db: Session = Depends(database.get_db)):
-    sim = db.query(models.Simulation).filter(models.Simulation.share_token == token).first()
+async def get_shared_simulation(token: str, request: Request, db: Session = Depends(database.get_session)):
+    entry = share_cache.get(token)
+    if entry is None:
+        sim = await database.run(db, crud.get_simulation_by_share_token, token)
+        if not sim:
+            raise HTTPException(status_code=404, detail="Shared plan not found")
+        entry = share_cache.put(token, sim)
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": share_cache.CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cohort_query(categoria_hyrox: str, metric: Optional[str]) -> tuple:
+    try:
+        return pacer.get_bench_key(categoria_hyrox), cohorts.metric_position(metric)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def cohort_not_ready():
+    return HTTPException(status_code=503, detail="Cohort index is loading", headers={"Retry-After": "5"})
+
+@api_router.get("/cohorts/percentile")
+def cohort_percentile(categoria_hyrox: str, tempo_alvo: str, athlete_level: Optional[str] = None, metric: Optional[str] = None):
+    # Where a finish time (or one station's time, with metric=<station>) ranks among saved plans
+    category, position = cohort_query(categoria_hyrox, metric)
+    seconds = pacer.parse_time_to_seconds(tempo_alvo)
+    if seconds <= 0:
+        raise HTTPException(status_code=400, detail="Invalid tempo_alvo (expected HH:MM:SS or MM:SS)")
+    try:
+        result = cohorts.index.percentile(category, athlete_level, position, seconds)
+    except cohorts.IndexNotReady:
+        raise cohort_not_ready()
+    return {"bench_category": category, "athlete_level": athlete_level, "metric": metric or cohorts.TOTAL, **result}
+
+@api_router.get("/cohorts/distribution")
+def cohort_distribution(categoria_hyrox: str, athlete_level: Optional[str] = None, metric: Optional[str] = None, buckets: int = 20):
+    category, position = cohort_query(categoria_hyrox, metric)
+    try:
+        result = cohorts.index.distribution(category, athlete_level, position, buckets)
+    except cohorts.IndexNotReady:
+        raise cohort_not_ready()
+    return {"bench_category": category, "athlete_level": athlete_level, "metric": metric or cohorts.TOTAL, **result}
+
+@api_router.get("/simulations/{simulation_id}/cohort")
+async def simulation_cohort(simulation_id: int, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    sim = await database.run(db, crud.get_user_simulation, simulation_id, current_user.id)
     if not sim:
-        raise HTTPException(status_code=404, detail="Shared plan not found")
-    return sim
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    try:
+        result = cohorts.index.compare(sim)
+    except cohorts.IndexNotReady:
+        raise cohort_not_ready()
+    if result is None:
+        raise HTTPException(status_code=404, detail="Simulation has no cohort summary (run python -m app.simulation_codec)")
+    return {"simulation_id": sim.id, **result}
 
 @api_router.get("/simulations/me", response_model=List[schemas.SimulationResponse])
-def read_my_simulations(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    simulations = db.query(models.Simulation).filter(models.Simulation.user_id == current_user.id).order_by(models.Simulation.created_at.desc()).all()
+async def read_my_simulations(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    simulations, next_cursor = await database.run(db, crud.list_simulations, current_user.id, pagination.page_size(limit), cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return simulations
 
+@api_router.get("/simulations/me/summary", response_model=List[schemas.SimulationSummary])
+async def read_my_simulation_summaries(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    simulations, next_cursor = await database.run(
+        db, crud.list_simulations, current_user.id, pagination.page_size(limit), cursor, summary=True
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return simulations
+
+def history_export_response(request: Request, kind: str, user_id: int, filename: str) -> StreamingResponse:
+    rows = history_io.iter_export(kind, user_id)
+
+    async def stream():
+        try:
+            async for chunk in iterate_in_threadpool(rows):
+                if await request.is_disconnected():
+                    break
+                yield chunk
+        finally:
+            rows.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=history_io.MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/simulations/me/export")
+async def export_my_simulations(request: Request, current_user: auth.Principal = Depends(auth.get_current_user)):
+    return history_export_response(request, "simulations", current_user.id, "simulations.ndjson")
+
+@api_router.post("/simulations/me/import")
+async def import_my_simulations(request: Request, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    return await history_io.import_ndjson("simulations", request.stream(), db, current_user.id)
+
 @api_router.delete("/simulations/{simulation_id}")
-def delete_simulation(simulation_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    sim = db.query(models.Simulation).filter(models.Simulation.id == simulation_id, models.Simulation.user_id == current_user.id).first()
+async def delete_simulation(simulation_id: int, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    sim = await database.run(db, crud.delete_simulation, simulation_id, current_user.id)
     if not sim:
         raise HTTPException(status_code=404, detail="Simulation not found")
-    db.delete(sim)
-    db.commit()
+    share_cache.evict(sim.share_token)
+    cohorts.index.remove(sim)
     return {"message": "Simulation deleted"}
 
 @api_router.get("/admin/users", response_model=List[schemas.UserResponse])
-def admin_read_users(
-    skip: int = 0, 
-    limit: int = 100, 
+async def admin_read_users(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     role: Optional[models.UserRole] = None,
     q: Optional[str] = None,
-    db: Session = Depends(database.get_db), 
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: Session = Depends(database.get_session), 
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    query = db.query(models.User)
-    if role:
-        query = query.filter(models.User.role == role)
-    if q:
-        query = query.filter(
-            (models.User.email.contains(q)) | (models.User.full_name.contains(q))
-        )
-    return query.offset(skip).limit(limit).all()
+    users, next_cursor, total = await database.run(
+        db, user_search.search_users, q, role, pagination.page_size(limit, user_search.DEFAULT_ADMIN_PAGE_SIZE), cursor,
+        with_total=cursor is None
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        response.headers[pagination.TOTAL_COUNT_HEADER] = str(total["count"])
+        response.headers[pagination.TOTAL_ESTIMATE_HEADER] = "true" if total["estimate"] else "false"
+        response.headers[pagination.TOTAL_CAPPED_HEADER] = "true" if total["capped"] else "false"
+    return users
+
+@api_router.get("/admin/pacer-cache")
+async def admin_pacer_cache_stats(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return {"benchmarks_version": benchmarks.registry.version, **pacer_cache.cache.stats()}
+
+@api_router.get("/admin/auth-cache")
+async def admin_auth_cache_stats(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return auth.principal_cache.stats()
+
+@api_router.get("/admin/password-hasher")
+async def admin_password_hasher_stats(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return passwords.hasher.stats()
+
+@api_router.get("/admin/share-cache")
+async def admin_share_cache_stats(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return share_cache.cache.stats()
+
+@api_router.get("/admin/db-pool")
+async def admin_db_pool_stats(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return {"db_mode": database.DB_MODE, "pools": database.pool_stats()}
+
+@api_router.get("/admin/cohorts")
+async def admin_cohort_stats(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return cohorts.index.stats()
+
+@api_router.post("/admin/cohorts/rebuild", status_code=202)
+async def admin_rebuild_cohorts(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    started = cohorts.index.rebuild_in_background()
+    return {"started": started, **cohorts.index.stats()}
+
+@api_router.get("/admin/profiles")
+def admin_list_profiles(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    # Sync handler: reads the profile directory in the threadpool
+    return {
+        "enabled": profiling.PROFILING_ENABLED,
+        "max_artifacts": profiling.PROFILE_MAX_ARTIFACTS,
+        "profiles": profiling.list_profiles(),
+    }
+
+@api_router.get("/admin/profiles/{profile_id}")
+def admin_download_profile(profile_id: str, current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    artifact = profiling.artifact_path(profile_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path, _mode = artifact
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
 
 @api_router.patch("/admin/users/{user_id}", response_model=schemas.UserResponse)
-def admin_update_user(
+async def admin_update_user(
     user_id: int, 
     update: schemas.AdminUserUpdate, 
-    db: Session = Depends(database.get_db), 
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: Session = Depends(database.get_session), 
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await database.run(db, crud.get_user, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    fields = {}
     if update.full_name is not None:
-        user.full_name = update.full_name
+        fields["full_name"] = update.full_name
     if update.role is not None:
-        user.role = update.role
+        fields["role"] = update.role
     if update.categoria_hyrox is not None:
-        user.categoria_hyrox = update.categoria_hyrox
+        fields["categoria_hyrox"] = update.categoria_hyrox
     if update.is_active is not None:
-        user.is_active = update.is_active
+        fields["is_active"] = update.is_active
         
-    db.commit()
-    db.refresh(user)
+    user = await database.run(db, crud.update_user, user, **fields)
+    auth.invalidate_user(user.email)
     return user
 
 @api_router.post("/admin/users/{user_id}/reset-password")
-def admin_reset_password(
+async def admin_reset_password(
     user_id: int, 
-    db: Session = Depends(database.get_db), 
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: Session = Depends(database.get_session), 
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await database.run(db, crud.get_user, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     temp_password = "Hyrox" + str(uuid.uuid4())[:8]
-    user.password_hash = auth.get_password_hash(temp_password)
-    db.commit()
+    password_hash = await passwords.hasher.hash(temp_password)
+    await database.run(db, crud.update_user, user, password_hash=password_hash)
+    auth.invalidate_user(user.email)
     
     return {"message": "Password reset successful", "temporary_password": temp_password}
 
 @api_router.post("/recovery/logs", response_model=schemas.RecoveryLogResponse)
-def create_recovery_log(log: schemas.RecoveryLogCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    db_log = models.RecoveryLog(
-        user_id=current_user.id,
+async def create_recovery_log(log: schemas.RecoveryLogCreate, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    db_log = await database.run(
+        db,
+        crud.create_recovery_log,
+        current_user.id,
         intensity=log.intensity,
         protocol_name=log.protocol_name,
         duration_minutes=log.duration_minutes
     )
-    db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
     return db_log
 
 @api_router.get("/recovery/logs/me", response_model=List[schemas.RecoveryLogResponse])
-def read_my_recovery_logs(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    logs = db.query(models.RecoveryLog).filter(models.RecoveryLog.user_id == current_user.id).order_by(models.RecoveryLog.created_at.desc()).all()
+async def read_my_recovery_logs(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_session),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    logs, next_cursor = await database.run(db, crud.list_recovery_logs, current_user.id, pagination.page_size(limit), cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return logs
 
+@api_router.get("/recovery/logs/me/export")
+async def export_my_recovery_logs(request: Request, current_user: auth.Principal = Depends(auth.get_current_user)):
+    return history_export_response(request, "recovery_logs", current_user.id, "recovery-logs.ndjson")
+
+@api_router.post("/recovery/logs/me/import")
+async def import_my_recovery_logs(request: Request, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
+    return await history_io.import_ndjson("recovery_logs", request.stream(), db, current_user.id)
+
 @api_router.post("/users/upgrade")
-def upgrade_user(request: auth.UpgradeRequest, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def upgrade_user(request: auth.UpgradeRequest, db: Session = Depends(database.get_session), current_user: auth.Principal = Depends(auth.get_current_user)):
     if request.new_role not in ["pro", "coach"]:
         raise HTTPException(status_code=400, detail="Invalid role")
     
-    current_user.role = request.new_role
-    db.commit()
+    user = await database.run(db, crud.get_user, current_user.id)
+    await database.run(db, crud.update_user, user, role=request.new_role)
+    auth.invalidate_user(user.email)
     return {"message": f"Successfully upgraded to {request.new_role}", "role": request.new_role}
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    benchmarks.registry.stop_watching()
+    montecarlo.shutdown_pool()
+    passwords.hasher.shutdown()
+    try:
+        if cohorts.index.save_snapshot():
+            print("--- COHORTS: snapshot saved ---", flush=True)
+    except Exception as e:
+        print(f"--- COHORTS ERROR: snapshot not saved: {e} ---", flush=True)
+    await database.dispose()
+
 # Include the API router
 app.include_router(api_router)
 
 # --- FRONTEND SERVING & DEFINITIVE SPA FALLBACK ---
-# O Docker coloca o frontend em /app/static
-STATIC_PATH = "/app/static"
-
-# 1. Montar assets se a pasta existir
-if os.path.exists(os.path.join(STATIC_PATH, "assets")):
-    app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_PATH, "assets")), name="assets")
+# O Docker coloca o frontend em /app/static; o manifesto é carregado no arranque
+# (static_files.py) e os pedidos nunca tocam no disco.
+def _unsafe_static_path(path: str) -> bool:
+    return "\\" in path or "\x00" in path or any(part in ("..", ".") for part in path.split("/"))
 
-# 2. Rota Catch-all (SPA Fallback)
+# Rota Catch-all (SPA Fallback)
 @app.get("/{catchall:path}")
-async def serve_frontend(catchall: str):
+async def serve_frontend(catchall: str, request: Request):
     # Se for um pedido para a API que não existe, mantém o 404 de API
     if catchall.startswith("api/"):
         return {"detail": "Not Found"}
 
-    # Tenta servir ficheiros reais (favicon, etc)
-    full_path = os.path.join(STATIC_PATH, catchall)
-    if os.path.exists(full_path) and os.path.isfile(full_path):
-        return FileResponse(full_path)
+    # Path traversal é rejeitado antes de qualquer lookup
+    if _unsafe_static_path(catchall):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    # Tenta servir ficheiros reais (assets, favicon, etc)
+    entry = static_files.manifest.lookup(catchall)
+    if entry is not None:
+        return static_files.manifest.respond(request, entry)
+
+    # Um asset com hash em falta é um 404, não o index.html com cache imutável
+    if catchall.startswith(static_files.ASSETS_PREFIX):
+        raise HTTPException(status_code=404, detail="Not Found")
 
     # Serve o index.html para QUALQUER outra rota (ex: /dashboard)
     # Isto permite que o React/Vue trate do roteamento
-    index_file = os.path.join(STATIC_PATH, "index.html")
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
-    
+    index = static_files.manifest.index
+    if index is not None:
+        return static_files.manifest.respond(request, index)
+
     return {"detail": "Frontend assets not found"}
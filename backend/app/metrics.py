@@ -0,0 +1,321 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Prometheus-format metrics without a client library.
+# Counters, gauges and histograms live in one process-wide registry rendered as
+# text exposition format on /metrics. Collectors are callables evaluated at
+# scrape time, used for numbers other modules already keep (cache and pool
+# stats). RequestMetricsMiddleware times every request by route template and
+# attributes the SQL statements it runs (via cursor events) to it; requests
+# over DB_QUERY_BUDGET statements are counted and logged as N+1 suspects.
+# All numbers are per process: with several uvicorn workers, scrape each one.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "15"))
+# /metrics needs this bearer token; without one it answers 404 unless METRICS_PUBLIC
+# is set (e.g. when the port is only reachable by the scraper)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+# (name, kind, documentation, [(label dict, value), ...])
+Collected = Tuple[str, str, str, List[Tuple[dict, float]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Collected]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[Collected]]):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        # Collectors may report the same family (e.g. one per cache); merge them
+        families: Dict[str, tuple] = {}
+        for collect in self._collectors:
+            try:
+                collected = list(collect())
+            except Exception as e:
+                # A broken collector must not take the whole scrape down
+                print(f"--- METRICS: collector {collect.__name__} failed: {e} ---", flush=True)
+                continue
+            for name, kind, documentation, samples in collected:
+                families.setdefault(name, (kind, documentation, []))[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                names = tuple(labels)
+                lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streaming the body.", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method",)))
+db_statements = registry.register(Counter(
+    "db_statements_total", "SQL statements executed.", ("engine",)))
+db_statement_latency = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time.", ("engine",), DB_LATENCY_BUCKETS))
+db_request_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS))
+db_request_time = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request.", ("method", "route"), DB_LATENCY_BUCKETS))
+n_plus_one = registry.register(Counter(
+    "http_request_n_plus_one_suspects_total", "Requests that ran more SQL statements than DB_QUERY_BUDGET.",
+    ("method", "route")))
+engine_latency = registry.register(Histogram(
+    "pacer_engine_duration_seconds", "Pacer engine computation time by operation.", ("operation",)))
+
+
+# --- Per-request DB accounting ---
+
+class _RequestDB:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Holds a mutable object so threadpool workers (which run on a copy of the
+# context) and greenlets update the same per-request totals
+_request_db: contextvars.ContextVar = contextvars.ContextVar("request_db", default=None)
+
+
+def instrument_engine(engine, name: str):
+    # engine: a sync Engine (for an AsyncEngine pass .sync_engine)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        db_statements.inc(name)
+        db_statement_latency.observe(name, value=elapsed)
+        current = _request_db.get()
+        if current is not None:
+            current.queries += 1
+            current.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_start"):
+            conn.info["metrics_start"].pop()
+
+
+@contextlib.contextmanager
+def time_operation(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        engine_latency.observe(operation, value=time.perf_counter() - start)
+
+
+# --- Middleware ---
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    # Pure ASGI so streaming responses are timed until their last chunk
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        db = _RequestDB()
+        token = _request_db.set(db)
+        http_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method)
+            _request_db.reset(token)
+            route = _route_template(scope)
+            http_requests.inc(method, route, str(status_holder["status"]))
+            http_latency.observe(method, route, value=elapsed)
+            db_request_queries.observe(method, route, value=db.queries)
+            if db.queries:
+                db_request_time.observe(method, route, value=db.seconds)
+            if db.queries > DB_QUERY_BUDGET:
+                n_plus_one.inc(method, route)
+                print(f"--- N+1 SUSPECT: {method} {route} ran {db.queries} queries "
+                      f"({db.seconds * 1000:.1f} ms in SQL, budget {DB_QUERY_BUDGET}) ---", flush=True)
+
+
+# --- Collectors for stats other modules keep ---
+
+def register_cache(cache):
+    # cache: an LRUCache
+    @registry.collector
+    def _collect_cache():
+        stats = cache.stats()
+        labels = {"cache": stats["name"]}
+        yield "cache_hits_total", "counter", "Cache hits.", [(labels, stats["hits"])]
+        yield "cache_misses_total", "counter", "Cache misses.", [(labels, stats["misses"])]
+        yield "cache_evictions_total", "counter", "Entries evicted by size.", [(labels, stats["evictions"])]
+        yield "cache_expirations_total", "counter", "Entries dropped by TTL.", [(labels, stats["expirations"])]
+        yield "cache_entries", "gauge", "Entries currently cached.", [(labels, stats["size"])]
+        yield "cache_hit_ratio", "gauge", "Hits over lookups since start.", [(labels, stats["hit_rate"])]
+
+    _collect_cache.__name__ = f"cache_{cache.name}"
+
+
+def register_stats(prefix: str, stats_fn: Callable[[], dict], gauges: Tuple[str, ...] = (),
+                   counters: Tuple[str, ...] = (), labels: Optional[Callable[[dict], dict]] = None):
+    # Expose selected numeric fields of a stats() dict (or list of dicts)
+    @registry.collector
+    def _collect_stats():
+        snapshots = stats_fn()
+        if isinstance(snapshots, dict):
+            snapshots = [snapshots]
+        for kind, fields in (("gauge", gauges), ("counter", counters)):
+            for field in fields:
+                samples = [(labels(s) if labels else {}, s[field]) for s in snapshots
+                           if isinstance(s.get(field), (int, float)) and not isinstance(s.get(field), bool)]
+                name = f"{prefix}_{field}" + ("_total" if kind == "counter" else "")
+                yield name, kind, f"{prefix} {field}.", samples
+
+    _collect_stats.__name__ = prefix
@@ -0,0 +1,368 @@
+import argparse
+import ast
+import contextlib
+import hashlib
+import inspect as pyinspect
+import os
+import sys
+import textwrap
+import time
+import tokenize
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import (JSON, VARBINARY, Boolean, Column, DateTime, Enum, ForeignKey, Index, Integer, MetaData,
+                        String, Table, inspect, text)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from . import database, models
+
+# Versioned schema migrations.
+# Each migration is a function taking a Connection, listed in MIGRATIONS in
+# version order. Applied versions are recorded in schema_version with a checksum
+# of the migration's version, name and normalized source (tokens, without
+# comments or layout), so an edited, renumbered or replaced migration is caught
+# instead of being silently skipped, while reformatting one is not. Schema
+# steps spell out their columns and indexes rather than reading models.py,
+# which moves with head (the checksum only covers the migration's own body).
+# Startup reads the ledger with one query and is done when it is at head;
+# otherwise it takes a database-level lock (GET_LOCK on MySQL, an
+# advisory lock on PostgreSQL, a lock file for SQLite), re-reads the ledger and
+# applies what is missing, each migration in its own transaction.
+#
+# Migrations must be idempotent: databases created before this ledger existed
+# start with an empty ledger and replay every step against their current schema.
+
+LOCK_NAME = "hyrox_schema_migrations"
+LOCK_TIMEOUT_SECONDS = int(os.getenv("MIGRATION_LOCK_TIMEOUT", "60"))
+
+# Python 3.12+ splits f-strings into FSTRING_START/MIDDLE/END tokens
+FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+FSTRING_END = getattr(tokenize, "FSTRING_END", None)
+
+ledger_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    ledger_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("checksum", String(64), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(f"{self.version}:{self.name}:{_normalized_source(self.apply)}".encode()).hexdigest()
+
+
+def _normalized_source(fn) -> str:
+    # The function's tokens without comments, layout, quote style or trailing commas,
+    # so reformatting a migration (black, isort, comments) keeps its checksum. f-strings are kept
+    # verbatim: Python 3.12 tokenizes them into parts, older versions as one STRING.
+    lines = textwrap.dedent(pyinspect.getsource(fn)).splitlines(keepends=True)
+    tokens, fstring_start = [], None
+    for tok in tokenize.generate_tokens(iter(lines).__next__):
+        if tok.type in (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+                        tokenize.ENDMARKER):
+            continue
+        if tok.type == FSTRING_START:
+            fstring_start = fstring_start or tok.start
+            continue
+        if fstring_start is not None:
+            if tok.type != FSTRING_END:
+                continue
+            value, fstring_start = _source_span(lines, fstring_start, tok.end), None
+        elif tok.type == tokenize.STRING:
+            try:
+                value = repr(ast.literal_eval(tok.string))
+            except ValueError:
+                value = tok.string
+        else:
+            value = tok.string
+        if value in (")", "]", "}") and tokens and tokens[-1] == ",":
+            tokens.pop()
+        tokens.append(value)
+    return " ".join(tokens)
+
+
+def _source_span(lines: list, start: tuple, end: tuple) -> str:
+    if start[0] == end[0]:
+        return lines[start[0] - 1][start[1]:end[1]]
+    return "".join([lines[start[0] - 1][start[1]:], *lines[start[0]:end[0] - 1], lines[end[0] - 1][:end[1]]])
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {col["name"] for col in inspect(conn).get_columns(table)}
+
+
+def _add_columns(conn: Connection, table: str, columns: dict):
+    existing = _columns(conn, table)
+    for name, column_type in columns.items():
+        if name not in existing:
+            print(f"--- MIGRATION: Adding column '{table}.{name}' ---", flush=True)
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+
+
+def _create_index(conn: Connection, table: str, name: str, columns: tuple, **kwargs):
+    if name in {ix["name"] for ix in inspect(conn).get_indexes(table)}:
+        return
+    print(f"--- MIGRATION: Creating index '{name}' ---", flush=True)
+    reflected = Table(table, MetaData(), autoload_with=conn)
+    Index(name, *[reflected.c[c] for c in columns], **kwargs).create(conn)
+
+
+# --- Migrations (append only; never edit one that has shipped) ---
+
+def create_tables(conn: Connection):
+    # The schema as it was before this ledger, frozen here: later migrations take it to
+    # head, so fresh and upgraded databases go through the same steps
+    metadata = MetaData()
+    Table(
+        "users", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("email", String(255), unique=True, index=True, nullable=False),
+        Column("password_hash", String(255), nullable=False),
+        Column("full_name", String(255)),
+        Column("age", Integer),
+        Column("categoria_hyrox", Enum("OPEN", "PRO", "DOUBLES", "SINGLE_OPEN", "SINGLE_PRO", "DOUBLES_MEN",
+                                       "DOUBLES_WOMEN", "DOUBLES_PRO", name="hyroxcategory")),
+        Column("role", Enum("ADMIN", "USER", "PRO", "COACH", name="userrole")),
+        Column("is_active", Boolean),
+    )
+    Table(
+        "simulations", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id")),
+        Column("tempo_alvo", String(50)),
+        Column("json_resultados", JSON),
+        Column("created_at", DateTime),
+        Column("share_token", String(100), unique=True, index=True, nullable=True),
+    )
+    Table(
+        "recovery_logs", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id")),
+        Column("intensity", Integer),
+        Column("protocol_name", String(255)),
+        Column("duration_minutes", Integer),
+        Column("created_at", DateTime),
+    )
+    metadata.create_all(bind=conn)
+
+
+def users_profile_columns(conn: Connection):
+    # Formerly main.migrate_schema, migrate_db.py and fix_is_active_column.py
+    _add_columns(conn, "users", {
+        "full_name": "VARCHAR(255)",
+        "age": "INTEGER",
+        "categoria_hyrox": "VARCHAR(50)",
+        "role": "VARCHAR(50)",
+        "is_active": "BOOLEAN DEFAULT TRUE",
+    })
+
+
+def simulations_created_at(conn: Connection):
+    # Formerly fix_db.py: early schemas named the column "data"
+    columns = _columns(conn, "simulations")
+    if "data" in columns and "created_at" not in columns:
+        print("--- MIGRATION: Renaming 'simulations.data' to 'created_at' ---", flush=True)
+        conn.execute(text("ALTER TABLE simulations RENAME COLUMN data TO created_at"))
+
+
+def history_indexes(conn: Connection):
+    _create_index(conn, "simulations", "ix_simulations_user_created", ("user_id", "created_at", "id"))
+    _create_index(conn, "recovery_logs", "ix_recovery_logs_user_created", ("user_id", "created_at", "id"))
+
+
+def admin_search_indexes(conn: Connection):
+    _create_index(conn, "users", "ix_users_role_id", ("role", "id"))
+    _create_index(conn, "users", "ft_users_full_name", ("full_name",), mysql_prefix="FULLTEXT", mysql_with_parser="ngram")
+
+
+def compact_simulation_columns(conn: Connection):
+    # Rows are converted separately: python -m app.simulation_codec
+    types = {
+        "splits_packed": VARBINARY(64),
+        "results_extra": JSON(),
+        "total_seconds": Integer(),
+        "bench_category": String(20),
+        "athlete_level": String(50),
+    }
+    _add_columns(conn, "simulations", {name: t.compile(dialect=conn.dialect) for name, t in types.items()})
+    _create_index(conn, "simulations", "ix_simulations_total_seconds", ("total_seconds",))
+    _create_index(conn, "simulations", "ix_simulations_cohort", ("bench_category", "athlete_level", "total_seconds"))
+
+
+def seed_admin(conn: Connection):
+    # Formerly checked on every startup
+    from . import auth
+
+    users = models.User.__table__
+    admin_email = "admin@hyrox.com"
+    if conn.execute(users.select().where(users.c.email == admin_email)).first() is None:
+        conn.execute(users.insert().values(
+            email=admin_email,
+            password_hash=auth.get_password_hash("admin123"),
+            full_name="System Admin",
+            role=models.UserRole.ADMIN,
+            is_active=True,
+        ))
+        print("--- SEED: Admin user created ---", flush=True)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create_tables", create_tables),
+    Migration(2, "users_profile_columns", users_profile_columns),
+    Migration(3, "simulations_created_at", simulations_created_at),
+    Migration(4, "history_indexes", history_indexes),
+    Migration(5, "admin_search_indexes", admin_search_indexes),
+    Migration(6, "compact_simulation_columns", compact_simulation_columns),
+    Migration(7, "seed_admin", seed_admin),
+]
+HEAD = MIGRATIONS[-1].version
+
+
+# --- Runner ---
+
+def applied_versions(engine: Engine) -> dict:
+    # {version: checksum}; empty when the ledger doesn't exist yet
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(schema_version.select().with_only_columns(
+                schema_version.c.version, schema_version.c.checksum)).all()
+    except (OperationalError, ProgrammingError):
+        # Only a missing ledger means "nothing applied"; connection errors propagate from here
+        if inspect(engine).has_table(schema_version.name):
+            raise
+        return {}
+    return {row.version: row.checksum for row in rows}
+
+
+def verify(applied: dict):
+    known = {m.version: m for m in MIGRATIONS}
+    for version, checksum in applied.items():
+        migration = known.get(version)
+        if migration is None:
+            raise MigrationError(f"Database has migration {version}, which this build doesn't know (newer build?)")
+        if migration.checksum != checksum:
+            raise MigrationError(f"Checksum mismatch for migration {version} ({migration.name}): "
+                                 "it was renamed or replaced after being applied")
+
+
+@contextlib.contextmanager
+def migration_lock(engine: Engine):
+    dialect = engine.dialect.name
+    if dialect == "mysql":
+        with engine.connect() as conn:
+            got = conn.execute(text("SELECT GET_LOCK(:name, :timeout)"),
+                               {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_SECONDS}).scalar()
+            if got != 1:
+                raise MigrationError(f"Timed out waiting for migration lock '{LOCK_NAME}'")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+    elif dialect == "postgresql":
+        key = int(hashlib.sha1(LOCK_NAME.encode()).hexdigest()[:15], 16)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+    elif dialect == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        import fcntl
+
+        with open(engine.url.database + ".migrate.lock", "w") as lock_file:
+            deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise MigrationError(f"Timed out waiting for migration lock '{lock_file.name}'")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def upgrade(engine: Engine = None) -> List[int]:
+    # Returns the versions applied by this call
+    engine = engine or database.engine
+    applied = applied_versions(engine)
+    verify(applied)
+    if max(applied, default=0) >= HEAD:
+        return []
+
+    done = []
+    with migration_lock(engine):
+        ledger_metadata.create_all(bind=engine)
+        # Another replica may have migrated while we waited for the lock
+        applied = applied_versions(engine)
+        verify(applied)
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            print(f"--- MIGRATION {migration.version}: {migration.name} ---", flush=True)
+            with engine.begin() as conn:
+                migration.apply(conn)
+                conn.execute(schema_version.insert().values(
+                    version=migration.version,
+                    name=migration.name,
+                    checksum=migration.checksum,
+                    applied_at=datetime.utcnow(),
+                ))
+            done.append(migration.version)
+    return done
+
+
+def status(engine: Engine = None) -> List[dict]:
+    applied = applied_versions(engine or database.engine)
+    return [
+        {
+            "version": m.version,
+            "name": m.name,
+            "applied": m.version in applied,
+            "checksum_ok": applied.get(m.version, m.checksum) == m.checksum,
+        }
+        for m in MIGRATIONS
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=("upgrade", "status"))
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for row in status():
+            mark = "x" if row["applied"] else " "
+            warning = "" if row["checksum_ok"] else "  CHECKSUM MISMATCH"
+            print(f"[{mark}] {row['version']:04d} {row['name']}{warning}")
+        return
+    try:
+        applied = upgrade()
+    except MigrationError as e:
+        print(f"--- MIGRATION ERROR: {e} ---", flush=True)
+        sys.exit(1)
+    print(f"--- MIGRATIONS: {'applied ' + str(applied) if applied else 'already at head'} (head {HEAD}) ---", flush=True)
+
+
+if __name__ == "__main__":
+    main()
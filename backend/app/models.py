@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, JSON, Boolean, Index, VARBINARY
 from sqlalchemy.orm import relationship
 from .database import Base
+from . import simulation_codec
 from datetime import datetime
 import enum
 
@@ -34,18 +35,50 @@ class User(Base):
 
     simulations = relationship("Simulation", back_populates="user")
 
+    # Admin search (see user_search.py). The FULLTEXT/ngram options only apply on
+    # MySQL; elsewhere this is a plain index on full_name.
+    __table_args__ = (
+        Index("ix_users_role_id", "role", "id"),
+        Index("ft_users_full_name", "full_name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
 class Simulation(Base):
     __tablename__ = "simulations"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     tempo_alvo = Column(String(50)) # stored as string "HH:MM:SS"
-    json_resultados = Column(JSON) # Stores the split calculation
+    # The split calculation lives in splits_packed + results_extra (see simulation_codec);
+    # the json_resultados column only holds payloads that don't fit that form
+    results_blob = Column("json_resultados", JSON, nullable=True)
+    splits_packed = Column(VARBINARY(64), nullable=True)
+    results_extra = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     share_token = Column(String(100), unique=True, index=True, nullable=True)
 
+    # Summary columns for analytics
+    total_seconds = Column(Integer, index=True)
+    bench_category = Column(String(20))
+    athlete_level = Column(String(50))
+
     user = relationship("User", back_populates="simulations")
 
+    # History pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_simulations_user_created", "user_id", "created_at", "id"),
+        Index("ix_simulations_cohort", "bench_category", "athlete_level", "total_seconds"),
+    )
+
+    @property
+    def json_resultados(self):
+        if self.splits_packed is not None:
+            return simulation_codec.decode(self.splits_packed, self.results_extra)
+        return self.results_blob
+
+    @json_resultados.setter
+    def json_resultados(self, payload):
+        simulation_codec.store(self, payload)
+
 class RecoveryLog(Base):
     __tablename__ = "recovery_logs"
 
@@ -57,3 +90,5 @@ class RecoveryLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User")
+
+    __table_args__ = (Index("ix_recovery_logs_user_created", "user_id", "created_at", "id"),)
@@ -0,0 +1,210 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from . import metrics, pacer
+
+# Monte Carlo finish-time distribution around the deterministic plan.
+# Each trial perturbs every station (lognormal noise), the athlete's fatigue
+# rate and the roxzone total. Trials are split into fixed-size chunks, each with
+# its own child SeedSequence, so a given seed gives the same result whatever the
+# worker count. Chunks return per-second histograms instead of raw samples,
+# which keeps the inter-process traffic tiny and the merge exact.
+#
+# The worker pool is created at startup from a forkserver (spawn where that
+# isn't available): forking the server process directly would copy locks held
+# by its threads (benchmark watcher, bcrypt executor, cohort loader).
+
+MONTECARLO_WORKERS = int(os.getenv("MONTECARLO_WORKERS", str(os.cpu_count() or 1)))
+MONTECARLO_CHUNK_SIZE = int(os.getenv("MONTECARLO_CHUNK_SIZE", "25000"))
+MONTECARLO_MAX_TRIALS = int(os.getenv("MONTECARLO_MAX_TRIALS", "1000000"))
+# Requests above this need a logged-in user (the endpoint itself is public)
+MONTECARLO_ANONYMOUS_MAX_TRIALS = int(os.getenv("MONTECARLO_ANONYMOUS_MAX_TRIALS", "100000"))
+
+# Histograms are sized by the largest sampled second, so inputs are bounded and
+# samples are clipped at CEILING_FACTOR x their plan time (a >9-sigma event at MAX_CV)
+MAX_CV = 0.5
+MAX_FATIGUE_SD = 0.05
+MAX_PLAN_SECONDS = 6 * 3600
+CEILING_FACTOR = 10
+
+FINISH_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+STATION_PERCENTILES = (10, 50, 90)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _mp_context():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if MONTECARLO_WORKERS <= 1:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MONTECARLO_WORKERS, mp_context=_mp_context())
+    return _pool
+
+
+def start_pool():
+    # Create the pool and start its workers in the background, not on the first simulation
+    pool = get_pool()
+    if pool is not None:
+        pool.submit(int)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _run_chunk(centers, fatigue_exponents, caps, roxzone_seconds, station_cv, run_cv, roxzone_cv,
+               fatigue_base, fatigue_sd, ceilings, trials, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    is_run = np.isnan(fatigue_exponents)
+
+    # Station noise: lognormal keeps times positive and the median on the plan
+    sigma = np.where(is_run, run_cv, station_cv)
+    stations = centers * np.exp(rng.standard_normal((trials, len(centers))) * sigma)
+
+    # Fatigue-rate noise, compounded the same way as the model (only on exercises)
+    trial_fatigue = np.clip(fatigue_base + rng.standard_normal(trials) * fatigue_sd, 1.0, None)
+    exponents = np.nan_to_num(fatigue_exponents)
+    stations *= (trial_fatigue[:, None] / fatigue_base) ** exponents
+    stations = np.maximum(stations, caps)
+
+    roxzone = roxzone_seconds * np.exp(rng.standard_normal(trials) * roxzone_cv)
+    columns = np.clip(np.rint(np.column_stack([stations, roxzone])), 0, ceilings).astype(np.int64)
+    finish = columns.sum(axis=1)
+
+    station_counts = [np.bincount(col) for col in columns.T]
+    return np.bincount(finish), station_counts
+
+
+def _merge(total, counts):
+    if total is None:
+        return counts.copy()
+    if len(counts) > len(total):
+        total, counts = counts.copy(), total
+    total[:len(counts)] += counts
+    return total
+
+
+def _percentiles(counts: np.ndarray, qs) -> List[int]:
+    cumulative = np.cumsum(counts)
+    n = cumulative[-1]
+    return [int(np.searchsorted(cumulative, max(int(np.ceil(q / 100 * n)), 1))) for q in qs]
+
+
+def _fmt(seconds: int) -> str:
+    return pacer.format_mmss(seconds)
+
+
+async def simulate(plan: dict, template: "pacer.PlanTemplate", total_seconds: int, trials: int,
+                   seed: Optional[int] = None, station_cv: float = 0.06, run_cv: float = 0.04,
+                   roxzone_cv: float = 0.10, fatigue_sd: float = 0.005) -> dict:
+    if not 1 <= trials <= MONTECARLO_MAX_TRIALS:
+        raise ValueError(f"trials must be between 1 and {MONTECARLO_MAX_TRIALS}")
+    if min(station_cv, run_cv, roxzone_cv, fatigue_sd) < 0:
+        raise ValueError("Variance parameters must be non-negative")
+    if max(station_cv, run_cv, roxzone_cv) > MAX_CV:
+        raise ValueError(f"station_cv, run_cv and roxzone_cv must be at most {MAX_CV}")
+    if fatigue_sd > MAX_FATIGUE_SD:
+        raise ValueError(f"fatigue_sd must be at most {MAX_FATIGUE_SD}")
+    started = time.perf_counter()
+
+    splits = plan["splits"]
+    centers = np.array([s["suggested_time_seconds"] for s in splits], dtype=np.float64)
+    fatigue_exponents = np.full(len(splits), np.nan)
+    caps = np.full(len(splits), pacer.NO_CAP)
+    for exercise_number, (pos, factors) in enumerate(zip(template.exercise_positions, template.factors), start=1):
+        fatigue_exponents[pos] = max(exercise_number - pacer.FATIGUE_FREE_STATIONS, 0)
+        caps[pos] = factors[3]
+    if (centers < 0).any():
+        raise ValueError("The plan has negative split times (run pace too slow for tempo_alvo)")
+    plan_seconds = centers.sum() + plan["roxzone_total_seconds"]
+    if max(plan_seconds, total_seconds) > MAX_PLAN_SECONDS:
+        raise ValueError(f"Plans longer than {pacer.format_seconds_to_time(MAX_PLAN_SECONDS)} can't be simulated")
+    ceilings = np.maximum(np.append(centers, plan["roxzone_total_seconds"]) * CEILING_FACTOR,
+                          np.append(caps, 0)) + 1
+
+    if seed is None:
+        seed = secrets.randbits(63)
+    chunk_sizes = [MONTECARLO_CHUNK_SIZE] * (trials // MONTECARLO_CHUNK_SIZE)
+    if trials % MONTECARLO_CHUNK_SIZE:
+        chunk_sizes.append(trials % MONTECARLO_CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    args = (centers, fatigue_exponents, caps, plan["roxzone_total_seconds"], station_cv, run_cv, roxzone_cv,
+            template.fatigue_base, fatigue_sd, ceilings)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool() if len(chunk_sizes) > 1 else None
+    # Single chunks are cheaper in a thread than shipping them to another process
+    results = await asyncio.gather(*[
+        loop.run_in_executor(pool, _run_chunk, *args, size, chunk_seed)
+        for size, chunk_seed in zip(chunk_sizes, seeds)
+    ])
+    sampled = time.perf_counter()
+
+    finish_counts = None
+    station_counts = [None] * (len(splits) + 1)
+    for finish, per_station in results:
+        finish_counts = _merge(finish_counts, finish)
+        for i, counts in enumerate(per_station):
+            station_counts[i] = _merge(station_counts[i], counts)
+
+    values = np.arange(len(finish_counts))
+    finish_pct = _percentiles(finish_counts, FINISH_PERCENTILES)
+    mean = float((values * finish_counts).sum() / trials)
+    std = float(np.sqrt(((values - mean) ** 2 * finish_counts).sum() / trials))
+    hit = float(finish_counts[:total_seconds + 1].sum() / trials) if total_seconds > 0 else 0.0
+
+    stations = []
+    names = [s["station"] for s in splits] + ["Roxzone"]
+    for name, counts in zip(names, station_counts):
+        p10, p50, p90 = _percentiles(counts, STATION_PERCENTILES)
+        stations.append({
+            "station": name,
+            "p10_seconds": p10, "p50_seconds": p50, "p90_seconds": p90,
+            "p10_formatted": _fmt(p10), "p50_formatted": _fmt(p50), "p90_formatted": _fmt(p90),
+        })
+
+    finished = time.perf_counter()
+    metrics.engine_latency.observe("montecarlo", value=finished - started)
+    return {
+        "target_time": plan["target_time"],
+        "bench_category": plan["bench_category"],
+        "athlete_level": plan["athlete_level"],
+        "trials": trials,
+        "seed": seed,
+        "probability_on_target": round(hit, 4),
+        "finish_time": {
+            "mean_seconds": round(mean, 1),
+            "std_seconds": round(std, 1),
+            "percentiles": {
+                f"p{q}": {"seconds": v, "formatted": pacer.format_seconds_to_time(v)}
+                for q, v in zip(FINISH_PERCENTILES, finish_pct)
+            },
+        },
+        "stations": stations,
+        "timings_ms": {
+            "sampling": round((sampled - started) * 1000, 2),
+            "aggregation": round((finished - sampled) * 1000, 2),
+            "total": round((finished - started) * 1000, 2),
+            "chunks": len(chunk_sizes),
+            "workers": MONTECARLO_WORKERS if pool is not None else 1,
+        },
+    }
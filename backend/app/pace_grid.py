@@ -0,0 +1,166 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Iterator, List, Optional, Sequence
+
+from . import pacer, pacer_batch
+
+# Pace-chart export: every (target time, category, athlete level) on a grid,
+# computed in batches through the vectorized engine and emitted row by row.
+# Only one batch is alive at a time, so memory stays flat for any grid size.
+
+DEFAULT_START = "00:55:00"
+DEFAULT_END = "02:30:00"
+DEFAULT_STEP_SECONDS = 30
+DEFAULT_CATEGORIES = ("Open", "Pro", "Doubles")
+DEFAULT_LEVELS = ("Recreativo", "Competitivo", "Elite")
+GRID_BATCH_SIZE = 500
+ROWS_PER_CHUNK = 250
+MAX_GRID_ROWS = 1000000
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+CSV_COLUMNS = (
+    ["target_time", "category", "athlete_level", "bench_category", "roxzone_seconds"]
+    + [s["name"] for s in pacer.STATIONS_CONFIG]
+)
+
+
+def grid_points(start: str = DEFAULT_START, end: str = DEFAULT_END, step_seconds: int = DEFAULT_STEP_SECONDS,
+                categories: Sequence[str] = DEFAULT_CATEGORIES, levels: Sequence[str] = DEFAULT_LEVELS) -> Iterator[tuple]:
+    start_seconds = pacer.parse_time_to_seconds(start)
+    end_seconds = pacer.parse_time_to_seconds(end)
+    if step_seconds <= 0:
+        raise ValueError("step_seconds must be positive")
+    if start_seconds <= 0 or end_seconds < start_seconds:
+        raise ValueError("Invalid grid range")
+    rows = ((end_seconds - start_seconds) // step_seconds + 1) * len(categories) * len(levels)
+    if rows > MAX_GRID_ROWS:
+        raise ValueError(f"Grid too large ({rows} rows, max {MAX_GRID_ROWS})")
+
+    for total in range(start_seconds, end_seconds + 1, step_seconds):
+        target = pacer.format_seconds_to_time(total)
+        for category in categories:
+            for level in levels:
+                yield target, category, level
+
+
+def iter_plans(points: Iterator[tuple], preferred_run_pace: Optional[str] = None, roxzone_minutes: Optional[float] = None,
+               pacing_mode: str = "heuristic", batch_size: int = GRID_BATCH_SIZE) -> Iterator[dict]:
+    batch: List[tuple] = []
+    for point in points:
+        batch.append(point)
+        if len(batch) >= batch_size:
+            yield from _run_batch(batch, preferred_run_pace, roxzone_minutes, pacing_mode)
+            batch = []
+    if batch:
+        yield from _run_batch(batch, preferred_run_pace, roxzone_minutes, pacing_mode)
+
+
+def _run_batch(batch, preferred_run_pace, roxzone_minutes, pacing_mode) -> Iterator[dict]:
+    targets, categories, levels = zip(*batch)
+    n = len(batch)
+    results = pacer_batch.calculate_splits_batch(
+        targets, categories, [preferred_run_pace] * n, [roxzone_minutes] * n, [False] * n, levels, [pacing_mode] * n
+    )
+    for category, result in zip(categories, results):
+        result["category"] = category
+        yield result
+
+
+def iter_csv(plans: Iterator[dict], header: bool = True) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    if header:
+        writer.writerow(CSV_COLUMNS)
+        yield flush()
+    for plan in plans:
+        writer.writerow(
+            [plan["target_time"], plan["category"], plan["athlete_level"], plan["bench_category"],
+             plan["roxzone_total_seconds"]]
+            + [s["suggested_time_seconds"] for s in plan["splits"]]
+        )
+        yield flush()
+
+
+def iter_ndjson(plans: Iterator[dict]) -> Iterator[str]:
+    for plan in plans:
+        yield json.dumps(plan, separators=(",", ":")) + "\n"
+
+
+def iter_chunks(rows: Iterator[str], rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[str]:
+    # Fewer, larger writes; each chunk is still bounded in size
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= rows_per_chunk:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def iter_export(fmt: str, **grid) -> Iterator[str]:
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    plan_options = {k: grid.pop(k) for k in ("preferred_run_pace", "roxzone_minutes", "pacing_mode") if k in grid}
+    points = grid_points(**grid)
+    # Validate the range before the first byte goes out
+    first = next(points, None)
+    if first is None:
+        return iter(())
+    plans = iter_plans(_chain(first, points), **plan_options)
+    return iter_chunks(iter_csv(plans) if fmt == "csv" else iter_ndjson(plans))
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a Hyrox pacing grid as CSV or NDJSON")
+    parser.add_argument("--start", default=DEFAULT_START)
+    parser.add_argument("--end", default=DEFAULT_END)
+    parser.add_argument("--step", type=int, default=DEFAULT_STEP_SECONDS, help="step in seconds")
+    parser.add_argument("--categories", default=",".join(DEFAULT_CATEGORIES))
+    parser.add_argument("--levels", default=",".join(DEFAULT_LEVELS))
+    parser.add_argument("--run-pace", default=None)
+    parser.add_argument("--roxzone-minutes", type=float, default=None)
+    parser.add_argument("--pacing-mode", default="heuristic", choices=pacer.PACING_MODES)
+    parser.add_argument("--format", default="csv", choices=FORMATS)
+    parser.add_argument("--output", "-o", default="-", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    rows = iter_export(
+        args.format,
+        start=args.start,
+        end=args.end,
+        step_seconds=args.step,
+        categories=[c.strip() for c in args.categories.split(",") if c.strip()],
+        levels=[lvl.strip() for lvl in args.levels.split(",") if lvl.strip()],
+        preferred_run_pace=args.run_pace,
+        roxzone_minutes=args.roxzone_minutes,
+        pacing_mode=args.pacing_mode,
+    )
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        for row in rows:
+            out.write(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
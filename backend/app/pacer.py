@@ -1,6 +1,9 @@
 import datetime
+from functools import lru_cache
 
+@lru_cache(maxsize=4096)
 def parse_time_to_seconds(time_str: str) -> int:
+    # Cached: the same handful of targets and paces arrive over and over
     try:
         if len(time_str.split(':')) == 2:
             # Handle MM:SS ? No, expecting HH:MM:SS as per prompt
@@ -10,31 +13,72 @@ def parse_time_to_seconds(time_str: str) -> int:
     except ValueError:
         return 0
 
-def format_seconds_to_time(seconds: int) -> str:
+def _format_seconds_to_time(seconds: int) -> str:
     m, s = divmod(seconds, 60)
     h, m = divmod(m, 60)
     return "{:02d}:{:02d}:{:02d}".format(int(h), int(m), int(s))
 
-import json
-import os
+# Precomputed "HH:MM:SS" / "MM:SS" strings for every second up to FORMAT_TABLE_SECONDS
+FORMAT_TABLE_SECONDS = 4 * 3600
+_HMS_TABLE = tuple(_format_seconds_to_time(s) for s in range(FORMAT_TABLE_SECONDS))
+_MMSS_TABLE = tuple(t[3:] for t in _HMS_TABLE)
+
+def format_seconds_to_time(seconds: int) -> str:
+    if type(seconds) is int and 0 <= seconds < FORMAT_TABLE_SECONDS:
+        return _HMS_TABLE[seconds]
+    return _format_seconds_to_time(seconds)
+
+def format_mmss(seconds: int) -> str:
+    # Same as format_seconds_to_time(seconds)[3:]
+    if type(seconds) is int and 0 <= seconds < FORMAT_TABLE_SECONDS:
+        return _MMSS_TABLE[seconds]
+    return _format_seconds_to_time(seconds)[3:]
+
+from . import benchmarks
 
 def load_benchmarks():
-    data_path = os.path.join(os.path.dirname(__file__), "data", "hyrox_benchmarks.json")
-    try:
-        with open(data_path, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading benchmarks: {e}")
-        return {}
+    # Served from the in-memory registry; no file I/O on the request path
+    return benchmarks.get_benchmarks().as_dict()
 
-def calculate_splits(target_time_str: str, category: str, preferred_run_pace: str = None, roxzone_minutes: float = None, is_elite: bool = False, athlete_level: str = "Competitivo"):
-    # 1. Initialization
-    total_seconds = parse_time_to_seconds(target_time_str)
-    cat_lower = category.lower()
-    level_lower = athlete_level.lower()
-    benchmarks_data = load_benchmarks()
+# Race order: 8 x (1km run + station).
+# erg: gets a pace per 500m; strength: Recreativo takes 15% longer;
+# cap: minimum seconds unless elite; adjustable: absorbs the final reconciliation.
+STATIONS_CONFIG = [
+    {"name": "Run 1 (1km)", "type": "run", "key": None},
+    {"name": "Ski Erg (1000m)", "type": "exercise", "key": "ski", "erg": True, "strength": False, "cap": 170, "adjustable": False},
+    {"name": "Run 2 (1km)", "type": "run", "key": None},
+    {"name": "Sled Push (50m)", "type": "exercise", "key": "sled_push", "erg": False, "strength": True, "cap": None, "adjustable": True},
+    {"name": "Run 3 (1km)", "type": "run", "key": None},
+    {"name": "Sled Pull (50m)", "type": "exercise", "key": "sled_pull", "erg": False, "strength": True, "cap": None, "adjustable": True},
+    {"name": "Run 4 (1km)", "type": "run", "key": None},
+    {"name": "Burpee Broad Jumps (80m)", "type": "exercise", "key": "burpees", "erg": False, "strength": True, "cap": 190, "adjustable": False},
+    {"name": "Run 5 (1km)", "type": "run", "key": None},
+    {"name": "Rowing (1000m)", "type": "exercise", "key": "row", "erg": True, "strength": False, "cap": None, "adjustable": True},
+    {"name": "Run 6 (1km)", "type": "run", "key": None},
+    {"name": "Farmers Carry (200m)", "type": "exercise", "key": "farmers", "erg": False, "strength": True, "cap": None, "adjustable": True},
+    {"name": "Run 7 (1km)", "type": "run", "key": None},
+    {"name": "Sandbag Lunges (100m)", "type": "exercise", "key": "lunges", "erg": False, "strength": True, "cap": None, "adjustable": True},
+    {"name": "Run 8 (1km)", "type": "run", "key": None},
+    {"name": "Wall Balls (75/100)", "type": "exercise", "key": "wall_balls", "erg": False, "strength": True, "cap": None, "adjustable": True},
+]
+
+# Model constants
+FATIGUE_BASE = 1.02        # cumulative after the 2nd station
+ELITE_FATIGUE_BASE = 1.01  # Elite has better recovery
+FATIGUE_FREE_STATIONS = 2
+RECREATIVO_STRENGTH_FACTOR = 1.15
+RECONCILE_TOLERANCE = 5    # seconds
 
-    # 2. Category Mapping to Benchmark Keys
+# Pacing modes: "heuristic" splits the target evenly (total // 16) when no run
+# pace is given; "solver" finds the run pace at which the model hits the target.
+PACING_MODES = ("heuristic", "solver")
+SOLVER_MAX_ITERATIONS = 40
+SOLVER_CACHE_SIZE = 4096
+
+NO_CAP = float("-inf")
+
+def get_bench_key(category: str) -> str:
+    cat_lower = category.lower()
     bench_key = "OPEN_M"
     if "pro" in cat_lower:
         bench_key = "PRO_M"
@@ -43,119 +87,173 @@ def calculate_splits(target_time_str: str, category: str, preferred_run_pace: st
         # Requirement usually implies DOUBLES_M for general doubles.
         # User specified DOUBLES_M in the JSON.
         bench_key = "DOUBLES_M" if "pro" not in cat_lower else "PRO_M"
-    
-    bench = benchmarks_data.get(bench_key, benchmarks_data.get("OPEN_M"))
-    
-    # 3. Reference Values
-    bench_run_base = bench.get("run_base", 300) # seconds
-    user_run_pace_seconds = parse_time_to_seconds(preferred_run_pace) if preferred_run_pace else (total_seconds // 16) # Heuristic if none
-    
-    # Ratio Calculation
-    pace_ratio = user_run_pace_seconds / bench_run_base
-
-    # 4. Station Definitions & Proportional Calculation
-    # Based on: Tempo_Previsto = Benchmark_Estação * (Pace_Corrida_Utilizador / Run_Base_Categoria)
-    stations_config = [
-        {"name": "Run 1 (1km)", "type": "run", "key": None},
-        {"name": "Ski Erg (1000m)", "type": "exercise", "key": "ski"},
-        {"name": "Run 2 (1km)", "type": "run", "key": None},
-        {"name": "Sled Push (50m)", "type": "exercise", "key": "sled_push"},
-        {"name": "Run 3 (1km)", "type": "run", "key": None},
-        {"name": "Sled Pull (50m)", "type": "exercise", "key": "sled_pull"},
-        {"name": "Run 4 (1km)", "type": "run", "key": None},
-        {"name": "Burpee Broad Jumps (80m)", "type": "exercise", "key": "burpees"},
-        {"name": "Run 5 (1km)", "type": "run", "key": None},
-        {"name": "Rowing (1000m)", "type": "exercise", "key": "row"},
-        {"name": "Run 6 (1km)", "type": "run", "key": None},
-        {"name": "Farmers Carry (200m)", "type": "exercise", "key": "farmers"},
-        {"name": "Run 7 (1km)", "type": "run", "key": None},
-        {"name": "Sandbag Lunges (100m)", "type": "exercise", "key": "lunges"},
-        {"name": "Run 8 (1km)", "type": "run", "key": None},
-        {"name": "Wall Balls (75/100)", "type": "exercise", "key": "wall_balls"},
-    ]
-
-    # 5. Fatigue Logic (1.02 cumulative after 2nd station)
-    fatigue_base = 1.02
-    if level_lower == "elite" or is_elite:
-        fatigue_base = 1.01 # Elite has better recovery
-    
-    # 6. Hard Caps (Ski 170s, Burpees 190s)
-    # Elite bypasses limits
-    bypass_limits = (level_lower == "elite" or is_elite)
+    return bench_key
 
-    results = []
-    exercise_count = 0
-    calculated_sum = 0
-    
-    # Roxzone Calc
-    if roxzone_minutes and roxzone_minutes > 0:
-        roxzone_seconds = int(roxzone_minutes * 60)
-    else:
-        # Defaults
-        roxzone_seconds = int(total_seconds * (0.10 if "doubles" in cat_lower else 0.08))
-        if "doubles" in cat_lower:
-            roxzone_seconds += 40 # Tag transitions
-
-    for s in stations_config:
-        if s["type"] == "run":
-            station_time = user_run_pace_seconds
-        else:
+class Station:
+    __slots__ = ("name", "type", "key", "is_run", "is_erg", "adjustable")
+
+    def __init__(self, config: dict):
+        self.name = config["name"]
+        self.type = config["type"]
+        self.key = config["key"]
+        self.is_run = config["type"] == "run"
+        self.is_erg = bool(config.get("erg"))
+        self.adjustable = bool(config.get("adjustable"))
+
+STATIONS = tuple(Station(c) for c in STATIONS_CONFIG)
+
+class PlanTemplate:
+    # Everything about a plan that does not depend on the target time or run pace.
+    # factors holds (benchmark, fatigue multiplier, level multiplier, cap) per
+    # exercise, applied in that order so the result matches the original loop.
+    __slots__ = ("bench_key", "run_base", "fatigue_base", "factors", "exercise_positions",
+                 "erg_positions", "adjustable_positions", "run_count", "solved_paces")
+
+    def __init__(self, bench, bench_key: str, recreativo: bool, elite: bool):
+        self.bench_key = bench_key
+        self.run_base = bench.get("run_base", 300)
+        self.fatigue_base = ELITE_FATIGUE_BASE if elite else FATIGUE_BASE
+
+        factors = []
+        exercise_count = 0
+        for config in STATIONS_CONFIG:
+            if config["type"] == "run":
+                continue
             exercise_count += 1
-            bench_val = bench.get(s["key"], 300)
-            
-            # Base Proportional
-            station_time = bench_val * pace_ratio
-            
-            # Fatigue: Multiplicador de 1.02 (acumulativo) a cada estação após a segunda.
-            if exercise_count > 2:
-                fatigue_multiplier = fatigue_base ** (exercise_count - 2)
-                station_time *= fatigue_multiplier
-            
-            # Athlete Level Adjustments
-            if level_lower == "recreativo":
-                # Recreativo takes 15% longer on strength (non-ergs)
-                if s["key"] not in ["ski", "row"]:
-                    station_time *= 1.15
-
-            # Hard Caps (Ski 170s, Burpees 190s)
-            if not bypass_limits:
-                if s["key"] == "ski":
-                    station_time = max(station_time, 170)
-                if s["key"] == "burpees":
-                    station_time = max(station_time, 190)
-
-        calculated_sum += int(station_time)
+            fatigue = self.fatigue_base ** max(exercise_count - FATIGUE_FREE_STATIONS, 0)
+            level = RECREATIVO_STRENGTH_FACTOR if recreativo and config.get("strength") else 1.0
+            # Elite bypasses limits
+            cap = NO_CAP if elite or config.get("cap") is None else config["cap"]
+            factors.append((bench.get(config["key"], 300), fatigue, level, cap))
+        self.factors = tuple(factors)
+
+        exercises = [i for i, st in enumerate(STATIONS) if not st.is_run]
+        self.exercise_positions = tuple(exercises)
+        self.erg_positions = tuple(i for i in exercises if STATIONS[i].is_erg)
+        self.adjustable_positions = tuple(i for i in exercises if STATIONS[i].adjustable)
+        self.run_count = sum(1 for st in STATIONS if st.is_run)
+        self.solved_paces = {}
+
+    def station_seconds(self, run_pace_seconds: int) -> list:
+        # Raw (pre-reconciliation) integer split per station, in race order
+        pace_ratio = run_pace_seconds / self.run_base
+        seconds = [run_pace_seconds] * len(STATIONS)
+        for pos, (bench_val, fatigue, level, cap) in zip(self.exercise_positions, self.factors):
+            station_time = bench_val * pace_ratio * fatigue * level
+            seconds[pos] = int(station_time if station_time > cap else cap)
+        return seconds
+
+    def solve_run_pace(self, total_seconds: int, roxzone_seconds: int) -> int:
+        # Integer run pace p whose modeled splits sum closest to the time left
+        # after roxzone. sum(station_seconds(p)) is non-decreasing in p (every
+        # factor is positive and caps are floors), so bisection applies: find the
+        # largest p that fits the budget, then check whether p + 1 lands closer.
+        key = (total_seconds, roxzone_seconds)
+        pace = self.solved_paces.get(key)
+        if pace is not None:
+            return pace
+
+        budget = total_seconds - roxzone_seconds
+        lo, hi = 0, max(budget // self.run_count, 0) # runs alone need run_count * p
+        iterations = 0
+        while lo < hi and iterations < SOLVER_MAX_ITERATIONS:
+            mid = (lo + hi + 1) // 2
+            if sum(self.station_seconds(mid)) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+            iterations += 1
+
+        pace = lo
+        if abs(sum(self.station_seconds(lo + 1)) - budget) < abs(sum(self.station_seconds(lo)) - budget):
+            pace = lo + 1
+
+        if len(self.solved_paces) >= SOLVER_CACHE_SIZE:
+            self.solved_paces.clear()
+        self.solved_paces[key] = pace
+        return pace
+
+_templates = {}
+
+@benchmarks.registry.on_reload
+def _clear_templates(_benchmark_set):
+    _templates.clear()
+
+def get_template(bench_key: str, athlete_level: str = "Competitivo", is_elite: bool = False) -> PlanTemplate:
+    level_lower = athlete_level.lower()
+    elite = level_lower == "elite" or bool(is_elite)
+    recreativo = level_lower == "recreativo"
+    benchmark_set = benchmarks.get_benchmarks()
+    key = (benchmark_set.version, bench_key, recreativo, elite)
+    template = _templates.get(key)
+    if template is None:
+        template = PlanTemplate(benchmark_set.category(bench_key), bench_key, recreativo, elite)
+        _templates[key] = template
+    return template
+
+def default_roxzone_seconds(total_seconds: int, category: str, roxzone_minutes: float = None) -> int:
+    if roxzone_minutes and roxzone_minutes > 0:
+        return int(roxzone_minutes * 60)
+    # Defaults
+    doubles = "doubles" in category.lower()
+    roxzone_seconds = int(total_seconds * (0.10 if doubles else 0.08))
+    if doubles:
+        roxzone_seconds += 40 # Tag transitions
+    return roxzone_seconds
+
+def reconcile(seconds: list, template: PlanTemplate, total_seconds: int, roxzone_seconds: int) -> list:
+    # Final Adjustment to meet Target Time (adjusting exercises if needed).
+    # We apply the difference to non-cap-bound exercise stations to maintain realism
+    diff = total_seconds - (sum(seconds) + roxzone_seconds)
+    if abs(diff) > RECONCILE_TOLERANCE and template.adjustable_positions:
+        per_station_adj = diff // len(template.adjustable_positions)
+        seconds = list(seconds)
+        for pos in template.adjustable_positions:
+            seconds[pos] += per_station_adj
+    return seconds
+
+def build_splits(raw_seconds: list, final_seconds: list, template: PlanTemplate) -> list:
+    results = []
+    for st, secs in zip(STATIONS, final_seconds):
         results.append({
-            "station": s["name"],
-            "type": s["type"],
-            "suggested_time_seconds": int(station_time),
-            "suggested_time_formatted": format_seconds_to_time(int(station_time))[3:] # MM:SS
+            "station": st.name,
+            "type": st.type,
+            "suggested_time_seconds": secs,
+            "suggested_time_formatted": format_mmss(secs)
         })
+    # Pace per 500m for Ergs, from the splits before reconciliation
+    for pos in template.erg_positions:
+        results[pos]["pace_per_500m"] = format_mmss(int(raw_seconds[pos] / 2))
+    return results
 
-    # Add pace per 500m for Ergs
-    for r in results:
-        if "Ski" in r["station"] or "Row" in r["station"]:
-            pace_seconds = r["suggested_time_seconds"] / 2
-            r["pace_per_500m"] = format_seconds_to_time(int(pace_seconds))[3:]
+def calculate_splits(target_time_str: str, category: str, preferred_run_pace: str = None, roxzone_minutes: float = None, is_elite: bool = False, athlete_level: str = "Competitivo", pacing_mode: str = "heuristic"):
+    if pacing_mode not in PACING_MODES:
+        raise ValueError(f"Invalid pacing_mode '{pacing_mode}' (expected one of {', '.join(PACING_MODES)})")
 
-    # Final Adjustment to meet Target Time (adjusting exercises if needed)
-    actual_total = calculated_sum + roxzone_seconds
-    diff = total_seconds - actual_total
-    
-    # We apply the difference to non-cap-bound exercise stations to maintain realism
-    if abs(diff) > 5:
-        adj_targets = [r for r in results if r["type"] == "exercise" and "Ski" not in r["station"] and "Burpee" not in r["station"]]
-        if adj_targets:
-            per_station_adj = diff // len(adj_targets)
-            for r in adj_targets:
-                r["suggested_time_seconds"] += int(per_station_adj)
-                r["suggested_time_formatted"] = format_seconds_to_time(int(r["suggested_time_seconds"]))[3:]
+    # 1. Initialization
+    total_seconds = parse_time_to_seconds(target_time_str)
+    bench_key = get_bench_key(category)
+    template = get_template(bench_key, athlete_level, is_elite)
+    roxzone_seconds = default_roxzone_seconds(total_seconds, category, roxzone_minutes)
+
+    # 2. Run pace: user's, solved from the target, or the even-split heuristic
+    if preferred_run_pace:
+        user_run_pace_seconds = parse_time_to_seconds(preferred_run_pace)
+    elif pacing_mode == "solver":
+        user_run_pace_seconds = template.solve_run_pace(total_seconds, roxzone_seconds)
+    else:
+        user_run_pace_seconds = total_seconds // 16
+
+    # 3. Splits: Tempo_Previsto = Benchmark_Estação * (Pace_Corrida_Utilizador / Run_Base_Categoria)
+    # with fatigue, level adjustments and hard caps baked into the template
+    raw_seconds = template.station_seconds(user_run_pace_seconds)
+    final_seconds = reconcile(raw_seconds, template, total_seconds, roxzone_seconds)
 
     return {
         "target_time": target_time_str,
         "roxzone_total_seconds": int(roxzone_seconds),
-        "roxzone_formatted": format_seconds_to_time(int(roxzone_seconds))[3:],
-        "splits": results,
+        "roxzone_formatted": format_mmss(int(roxzone_seconds)),
+        "splits": build_splits(raw_seconds, final_seconds, template),
         "athlete_level": athlete_level,
         "bench_category": bench_key
     }
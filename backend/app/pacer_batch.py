@@ -0,0 +1,230 @@
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from . import benchmarks, metrics
+from .pacer import (
+    ELITE_FATIGUE_BASE, FATIGUE_BASE, FATIGUE_FREE_STATIONS, NO_CAP, PACING_MODES, RECONCILE_TOLERANCE,
+    RECREATIVO_STRENGTH_FACTOR, SOLVER_MAX_ITERATIONS, STATIONS_CONFIG, format_mmss, get_bench_key, parse_time_to_seconds,
+)
+
+# Vectorized version of pacer.calculate_splits.
+# Every plan in a batch is one row; the 16 stations are the columns. The float
+# operations are applied in the same order as the scalar loop so the integer
+# splits come out identical.
+
+EXERCISES = [s for s in STATIONS_CONFIG if s["type"] == "exercise"]
+RUN_COLUMNS = np.array([i for i, s in enumerate(STATIONS_CONFIG) if s["type"] == "run"])
+EXERCISE_COLUMNS = np.array([i for i, s in enumerate(STATIONS_CONFIG) if s["type"] == "exercise"])
+EXERCISE_KEYS = [s["key"] for s in EXERCISES]
+
+# Fatigue kicks in after the 2nd exercise: exponent 0 leaves the value untouched
+FATIGUE_EXPONENTS = np.maximum(np.arange(1, len(EXERCISES) + 1) - FATIGUE_FREE_STATIONS, 0).astype(np.float64)
+STRENGTH_MASK = np.array([bool(s.get("strength")) for s in EXERCISES])
+# Hard caps; -inf means no cap
+CAPS = np.array([NO_CAP if s.get("cap") is None else float(s["cap"]) for s in EXERCISES])
+# Stations that absorb the final reconciliation
+ADJUSTABLE_MASK = np.array([bool(s.get("adjustable")) for s in EXERCISES])
+ERG_COLUMNS = np.array([i for i, s in enumerate(STATIONS_CONFIG) if s.get("erg")])
+
+MAX_BATCH_SIZE = 10000
+
+
+@dataclass
+class BatchInputs:
+    total_seconds: np.ndarray      # (n,) int64
+    run_pace_seconds: np.ndarray   # (n,) int64
+    roxzone_seconds: np.ndarray    # (n,) int64
+    is_elite: np.ndarray           # (n,) bool, elite level or is_elite flag
+    is_recreativo: np.ndarray      # (n,) bool
+    bench_keys: List[str]          # (n,)
+    solve_pace: Optional[np.ndarray] = None  # (n,) bool, rows whose run pace is solved
+
+
+@dataclass
+class BatchResult:
+    station_seconds: np.ndarray    # (n, 16) int64, after reconciliation (if requested)
+    erg_pace_seconds: np.ndarray   # (n, 2) int64, from the pre-reconciliation splits
+    roxzone_seconds: np.ndarray    # (n,) int64
+    bench_keys: List[str]
+
+
+def prepare_inputs(
+    target_times: Sequence[str],
+    categories: Sequence[str],
+    run_paces: Sequence[Optional[str]],
+    roxzone_minutes: Sequence[Optional[float]],
+    is_elite: Sequence[bool],
+    athlete_levels: Sequence[str],
+    pacing_modes: Optional[Sequence[str]] = None,
+) -> BatchInputs:
+    n = len(target_times)
+    if pacing_modes is None:
+        pacing_modes = ["heuristic"] * n
+    if len(pacing_modes) != n:
+        raise ValueError("All batch input arrays must have the same length")
+    for mode in set(pacing_modes):
+        if mode not in PACING_MODES:
+            raise ValueError(f"Invalid pacing_mode '{mode}' (expected one of {', '.join(PACING_MODES)})")
+    if not (len(categories) == len(run_paces) == len(roxzone_minutes) == len(is_elite) == len(athlete_levels) == n):
+        raise ValueError("All batch input arrays must have the same length")
+
+    total = np.fromiter((parse_time_to_seconds(t) for t in target_times), dtype=np.int64, count=n)
+    cat_lower = [c.lower() for c in categories]
+    doubles = np.array(["doubles" in c for c in cat_lower], dtype=bool)
+
+    # Heuristic run pace when none is given
+    run_pace = np.fromiter(
+        (parse_time_to_seconds(p) if p else -1 for p in run_paces), dtype=np.int64, count=n
+    )
+    solve_pace = (run_pace < 0) & np.array([m == "solver" for m in pacing_modes], dtype=bool)
+    run_pace = np.where(run_pace < 0, total // 16, run_pace)
+
+    # Roxzone: explicit minutes, otherwise 8% (10% + 40s of tag transitions for doubles)
+    rox_given = np.array([float(r) if r and r > 0 else 0.0 for r in roxzone_minutes], dtype=np.float64)
+    rox_default = np.trunc(total * np.where(doubles, 0.10, 0.08)).astype(np.int64) + np.where(doubles, 40, 0)
+    roxzone = np.where(rox_given > 0, np.trunc(rox_given * 60).astype(np.int64), rox_default)
+
+    levels = [lvl.lower() for lvl in athlete_levels]
+    elite = np.array([lvl == "elite" or bool(e) for lvl, e in zip(levels, is_elite)], dtype=bool)
+    recreativo = np.array([lvl == "recreativo" for lvl in levels], dtype=bool)
+
+    return BatchInputs(
+        total_seconds=total,
+        run_pace_seconds=run_pace,
+        roxzone_seconds=roxzone,
+        is_elite=elite,
+        is_recreativo=recreativo,
+        bench_keys=[get_bench_key(c) for c in categories],
+        solve_pace=solve_pace,
+    )
+
+
+def _bench_arrays(bench_keys: List[str]):
+    benchmark_set = benchmarks.get_benchmarks()
+    unique = sorted(set(bench_keys))
+    index = {k: i for i, k in enumerate(unique)}
+    stations = np.array(
+        [[benchmark_set.category(k).get(key, 300) for key in EXERCISE_KEYS] for k in unique], dtype=np.float64
+    )
+    run_base = np.array([benchmark_set.category(k).get("run_base", 300) for k in unique], dtype=np.float64)
+    rows = np.fromiter((index[k] for k in bench_keys), dtype=np.int64, count=len(bench_keys))
+    return stations[rows], run_base[rows]
+
+
+class ExerciseModel:
+    # Per-row station factors; evaluates the exercise splits for any run pace
+    def __init__(self, inputs: BatchInputs, fatigue_base: Optional[np.ndarray] = None):
+        self.bench_stations, self.run_base = _bench_arrays(inputs.bench_keys)
+        if fatigue_base is None:
+            fatigue_base = np.where(inputs.is_elite, ELITE_FATIGUE_BASE, FATIGUE_BASE)
+        self.fatigue = np.power(fatigue_base[:, None], FATIGUE_EXPONENTS[None, :])
+        self.level = np.where(inputs.is_recreativo[:, None] & STRENGTH_MASK[None, :], RECREATIVO_STRENGTH_FACTOR, 1.0)
+        # Elite bypasses the hard caps
+        self.caps = np.where(inputs.is_elite[:, None], NO_CAP, CAPS[None, :])
+
+    def seconds(self, run_pace_seconds: np.ndarray, rows=slice(None)) -> np.ndarray:
+        pace_ratio = run_pace_seconds / self.run_base[rows]
+        exercise = self.bench_stations[rows] * pace_ratio[:, None]
+        exercise = exercise * self.fatigue[rows]
+        exercise = exercise * self.level[rows]
+        exercise = np.maximum(exercise, self.caps[rows])
+        return np.trunc(exercise).astype(np.int64)
+
+    def total(self, run_pace_seconds: np.ndarray, rows=slice(None)) -> np.ndarray:
+        return len(RUN_COLUMNS) * run_pace_seconds + self.seconds(run_pace_seconds, rows).sum(axis=1)
+
+
+def solve_run_paces(model: ExerciseModel, budget: np.ndarray, rows=slice(None)) -> np.ndarray:
+    # Same integer bisection as PlanTemplate.solve_run_pace, run on all rows at once
+    lo = np.zeros_like(budget)
+    hi = np.maximum(budget // len(RUN_COLUMNS), 0)
+    for _ in range(SOLVER_MAX_ITERATIONS):
+        active = lo < hi
+        if not active.any():
+            break
+        mid = (lo + hi + 1) // 2
+        fits = model.total(mid, rows) <= budget
+        lo = np.where(active & fits, mid, lo)
+        hi = np.where(active & ~fits, mid - 1, hi)
+    closer = np.abs(model.total(lo + 1, rows) - budget) < np.abs(model.total(lo, rows) - budget)
+    return np.where(closer, lo + 1, lo)
+
+
+def compute_batch(inputs: BatchInputs, fatigue_base: Optional[np.ndarray] = None, reconcile: bool = True) -> BatchResult:
+    n = len(inputs.total_seconds)
+    model = ExerciseModel(inputs, fatigue_base)
+
+    run_pace = inputs.run_pace_seconds
+    if inputs.solve_pace is not None and inputs.solve_pace.any():
+        rows = np.flatnonzero(inputs.solve_pace)
+        run_pace = run_pace.copy()
+        budget = inputs.total_seconds[rows] - inputs.roxzone_seconds[rows]
+        run_pace[rows] = solve_run_paces(model, budget, rows)
+
+    exercise = model.seconds(run_pace)
+
+    seconds = np.empty((n, len(STATIONS_CONFIG)), dtype=np.int64)
+    seconds[:, RUN_COLUMNS] = run_pace[:, None]
+    seconds[:, EXERCISE_COLUMNS] = exercise
+
+    erg_pace = np.trunc(seconds[:, ERG_COLUMNS] / 2).astype(np.int64)
+
+    if reconcile:
+        # Final adjustment to meet the target time, spread over the non-capped exercises
+        diff = inputs.total_seconds - (seconds.sum(axis=1) + inputs.roxzone_seconds)
+        per_station_adj = np.where(np.abs(diff) > RECONCILE_TOLERANCE, diff // int(ADJUSTABLE_MASK.sum()), 0)
+        seconds[:, EXERCISE_COLUMNS[ADJUSTABLE_MASK]] += per_station_adj[:, None]
+
+    return BatchResult(
+        station_seconds=seconds,
+        erg_pace_seconds=erg_pace,
+        roxzone_seconds=inputs.roxzone_seconds,
+        bench_keys=inputs.bench_keys,
+    )
+
+
+def build_result(result: BatchResult, row: int, target_time_str: str, athlete_level: str) -> dict:
+    # Same response shape as pacer.calculate_splits
+    splits = []
+    erg_paces = iter(result.erg_pace_seconds[row].tolist())
+    for s, secs in zip(STATIONS_CONFIG, result.station_seconds[row].tolist()):
+        split = {
+            "station": s["name"],
+            "type": s["type"],
+            "suggested_time_seconds": secs,
+            "suggested_time_formatted": format_mmss(secs),
+        }
+        if s.get("erg"):
+            split["pace_per_500m"] = format_mmss(next(erg_paces))
+        splits.append(split)
+
+    roxzone_seconds = int(result.roxzone_seconds[row])
+    return {
+        "target_time": target_time_str,
+        "roxzone_total_seconds": roxzone_seconds,
+        "roxzone_formatted": format_mmss(roxzone_seconds),
+        "splits": splits,
+        "athlete_level": athlete_level,
+        "bench_category": result.bench_keys[row],
+    }
+
+
+@metrics.time_operation("batch")
+def calculate_splits_batch(
+    target_times: Sequence[str],
+    categories: Sequence[str],
+    run_paces: Sequence[Optional[str]],
+    roxzone_minutes: Sequence[Optional[float]],
+    is_elite: Sequence[bool],
+    athlete_levels: Sequence[str],
+    pacing_modes: Optional[Sequence[str]] = None,
+) -> List[dict]:
+    if len(target_times) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch too large (max {MAX_BATCH_SIZE} plans)")
+    if not target_times:
+        return []
+    inputs = prepare_inputs(target_times, categories, run_paces, roxzone_minutes, is_elite, athlete_levels, pacing_modes)
+    result = compute_batch(inputs)
+    return [build_result(result, i, target_times[i], athlete_levels[i]) for i in range(len(target_times))]
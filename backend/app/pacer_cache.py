@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+from . import benchmarks, metrics, pacer
+from .cache import LRUCache
+
+# Memoized calculate_splits.
+# The key is built from normalized inputs (parsed seconds, bench key, the flags
+# that actually change the model) plus the benchmark version, so "1:30:00" and
+# "01:30:00" share an entry and a benchmark reload can never serve stale plans.
+
+PACER_CACHE_SIZE = int(os.getenv("PACER_CACHE_SIZE", "4096"))
+PACER_CACHE_TTL = float(os.getenv("PACER_CACHE_TTL", "3600"))
+
+cache = LRUCache(maxsize=PACER_CACHE_SIZE, ttl=PACER_CACHE_TTL, name="pacer")
+
+
+@benchmarks.registry.on_reload
+def _invalidate(_benchmark_set):
+    cache.clear()
+
+
+def cache_key(tempo_alvo: str, category: str, preferred_run_pace: str = None, roxzone_minutes: float = None,
+              is_elite: bool = False, athlete_level: str = "Competitivo", pacing_mode: str = "heuristic") -> tuple:
+    if pacing_mode not in pacer.PACING_MODES:
+        raise ValueError(f"Invalid pacing_mode '{pacing_mode}' (expected one of {', '.join(pacer.PACING_MODES)})")
+    level_lower = athlete_level.lower()
+    elite = level_lower == "elite" or bool(is_elite)
+    return (
+        pacer.parse_time_to_seconds(tempo_alvo),
+        pacer.get_bench_key(category),
+        "doubles" in category.lower(),
+        pacer.parse_time_to_seconds(preferred_run_pace) if preferred_run_pace else None,
+        int(roxzone_minutes * 60) if roxzone_minutes and roxzone_minutes > 0 else None,
+        elite,
+        level_lower == "recreativo",
+        # The pacing mode only matters when no run pace is given
+        None if preferred_run_pace else pacing_mode,
+        benchmarks.get_benchmarks().version,
+    )
+
+
+def etag_for(key: tuple, tempo_alvo: str, athlete_level: str) -> str:
+    # target_time and athlete_level are echoed verbatim, so they are part of the body
+    digest = hashlib.sha1(repr((key, tempo_alvo, athlete_level)).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def calculate_splits(tempo_alvo: str, category: str, preferred_run_pace: str = None, roxzone_minutes: float = None,
+                     is_elite: bool = False, athlete_level: str = "Competitivo", pacing_mode: str = "heuristic",
+                     key: tuple = None) -> dict:
+    if key is None:
+        key = cache_key(tempo_alvo, category, preferred_run_pace, roxzone_minutes, is_elite, athlete_level, pacing_mode)
+    result = cache.get(key)
+    if result is None:
+        with metrics.time_operation("calculate_splits"):
+            result = pacer.calculate_splits(tempo_alvo, category, preferred_run_pace, roxzone_minutes, is_elite,
+                                            athlete_level, pacing_mode)
+        cache.set(key, result)
+    # Cached entries are shared: callers get their own copy (splits are flat dicts)
+    return {**result, "splits": [dict(split) for split in result["splits"]],
+            "target_time": tempo_alvo, "athlete_level": athlete_level}
@@ -0,0 +1,100 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from . import metrics, pacer, pacer_batch
+
+# What-if sweeps: one base plan, one or two parameter axes, and the whole
+# response surface computed in a single vectorized pass. By default the splits
+# are the raw model output (no reconciliation to tempo_alvo), so the finish
+# time actually moves with the swept parameter.
+#
+# Swept roxzone_minutes go through the same mapping as /calculate-pacer: 0 means
+# the category default (8% of the target, 10% + 40 s for doubles), so every
+# point can be reproduced with a single call. Negative values are rejected.
+
+SWEEP_PARAMETERS = ("run_pace", "roxzone_minutes", "fatigue_base", "athlete_level")
+MAX_AXIS_POINTS = 1000
+MAX_SWEEP_POINTS = 20000
+
+
+def axis_values(parameter: str, values: Optional[Sequence] = None, start: Optional[float] = None,
+                stop: Optional[float] = None, step: Optional[float] = None) -> list:
+    if parameter not in SWEEP_PARAMETERS:
+        raise ValueError(f"Invalid sweep parameter '{parameter}' (expected one of {', '.join(SWEEP_PARAMETERS)})")
+
+    if values is None:
+        if start is None or stop is None or not step or step <= 0 or stop < start:
+            raise ValueError(f"Axis '{parameter}' needs values or a start/stop/step range")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        if count > MAX_AXIS_POINTS:
+            raise ValueError(f"Axis '{parameter}' has too many points (max {MAX_AXIS_POINTS})")
+        values = [start + i * step for i in range(count)]
+    elif len(values) > MAX_AXIS_POINTS:
+        raise ValueError(f"Axis '{parameter}' has too many points (max {MAX_AXIS_POINTS})")
+
+    if parameter == "athlete_level":
+        return [str(v) for v in values]
+    if parameter == "run_pace":
+        # Seconds per km, or "MM:SS"
+        return [pacer.parse_time_to_seconds(v) if isinstance(v, str) else int(v) for v in values]
+    values = [float(v) for v in values]
+    if parameter == "roxzone_minutes" and min(values) < 0:
+        raise ValueError("roxzone_minutes must not be negative (0 means the category default)")
+    return values
+
+
+@metrics.time_operation("sweep")
+def sweep(base: dict, axes: List[dict], reconcile: bool = False) -> dict:
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("A sweep takes one or two axes")
+    names = [a["parameter"] for a in axes]
+    if len(set(names)) != len(names):
+        raise ValueError("Sweep axes must be different parameters")
+    grids = [axis_values(**a) for a in axes]
+    shape = [len(g) for g in grids]
+    n = int(np.prod(shape))
+    if n == 0:
+        raise ValueError("Sweep axes must not be empty")
+    if n > MAX_SWEEP_POINTS:
+        raise ValueError(f"Sweep too large ({n} points, max {MAX_SWEEP_POINTS})")
+
+    # Row-major: the last axis varies fastest
+    mesh = [m.ravel() for m in np.meshgrid(*[np.arange(k) for k in shape], indexing="ij")]
+    point_values = {name: [grid[i] for i in idx] for name, grid, idx in zip(names, grids, mesh)}
+
+    levels = point_values.get("athlete_level", [base["athlete_level"]] * n)
+    inputs = pacer_batch.prepare_inputs(
+        [base["tempo_alvo"]] * n,
+        [base["categoria_hyrox"]] * n,
+        [base["preferred_run_pace"]] * n,
+        point_values.get("roxzone_minutes", [base["roxzone_minutes"]] * n),
+        [base["is_elite"]] * n,
+        levels,
+        [base.get("pacing_mode", "heuristic")] * n,
+    )
+    if "run_pace" in point_values:
+        inputs.run_pace_seconds = np.array(point_values["run_pace"], dtype=np.int64)
+        inputs.solve_pace = None
+    fatigue_base = None
+    if "fatigue_base" in point_values:
+        fatigue_base = np.array(point_values["fatigue_base"], dtype=np.float64)
+        if (fatigue_base <= 0).any():
+            raise ValueError("fatigue_base must be positive")
+
+    result = pacer_batch.compute_batch(inputs, fatigue_base=fatigue_base, reconcile=reconcile)
+    finish = result.station_seconds.sum(axis=1) + result.roxzone_seconds
+    run_pace = result.station_seconds[:, pacer_batch.RUN_COLUMNS[0]]
+
+    return {
+        "stations": [s["name"] for s in pacer.STATIONS_CONFIG],
+        "axes": [{"parameter": name, "values": grid} for name, grid in zip(names, grids)],
+        "shape": shape,
+        "reconciled": reconcile,
+        "bench_category": pacer.get_bench_key(base["categoria_hyrox"]),
+        "target_seconds": int(inputs.total_seconds[0]),
+        "finish_seconds": finish.tolist(),
+        "run_pace_seconds": run_pace.tolist(),
+        "roxzone_seconds": result.roxzone_seconds.tolist(),
+        "station_seconds": result.station_seconds.tolist(),
+    }
@@ -0,0 +1,64 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Keyset ("seek") pagination on (created_at, id), newest first. The cursor is the
+# sort key of the last row served, so each page is an index range scan on
+# (user_id, created_at, id) no matter how deep the client has paged, unlike
+# OFFSET. Cursors are opaque to clients: base64url JSON, not a contract.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_ESTIMATE_HEADER = "X-Total-Count-Estimate"
+TOTAL_CAPPED_HEADER = "X-Total-Count-Capped"  # the count is a lower bound
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE) -> int:
+    if limit is None:
+        return default
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _created_after(model, cursor: str):
+    values = decode_cursor(cursor)
+    try:
+        created_at, row_id = datetime.fromisoformat(values[0]), int(values[1])
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return or_(model.created_at < created_at, and_(model.created_at == created_at, model.id < row_id))
+
+
+def newest_first(query, model, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    # One extra row tells us whether another page exists without a COUNT
+    if cursor:
+        query = query.filter(_created_after(model, cursor))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,193 @@
+import os
+from typing import Dict, Optional
+
+from . import benchmarks, metrics, pacer
+from .cache import LRUCache
+
+# Doubles work-split optimizer.
+# Both partners run every 1km together (so a run goes at the slower, fatigued
+# pace); on each station only one partner works at a time and the work is split
+# in WORK_STEPS increments. Each partner slows down with the work they have
+# already done: multiplier = fatigue_rate ** (stations of work done so far).
+#
+# Total work done before station k is always k whole stations, so the state is
+# just (station, partner A's accumulated work) and B's follows from it. Dynamic
+# programming over that state is exact and costs stations x states x choices.
+
+WORK_STEPS = 10 # 10% increments
+DEFAULT_FATIGUE_RATE = 1.03
+MAX_FATIGUE_RATE = 1.5 # ~25x slower by the last station; beyond that the plan is meaningless
+MAX_TRANSITION_SECONDS = 300
+MAX_STATION_SECONDS = 3600
+MAX_ROXZONE_MINUTES = 60
+DEFAULT_TRANSITION_SECONDS = 5.0
+DEFAULT_SWITCHES_PER_SHARED_STATION = 3
+PARTNER_CACHE_SIZE = int(os.getenv("PARTNER_CACHE_SIZE", "1024"))
+
+RACE_STATIONS = [s for s in pacer.STATIONS_CONFIG if s["type"] == "exercise"]
+RACE_RUNS = [s for s in pacer.STATIONS_CONFIG if s["type"] == "run"]
+
+plan_cache = LRUCache(maxsize=PARTNER_CACHE_SIZE, name="partner")
+
+
+@benchmarks.registry.on_reload
+def _invalidate(_benchmark_set):
+    plan_cache.clear()
+
+
+def _solo_reference_key(category: str) -> str:
+    # DOUBLES_M benchmarks are already shared times; solo times come from the singles tables
+    return "PRO_M" if "pro" in category.lower() else "OPEN_M"
+
+
+def solo_station_seconds(category: str, run_pace_seconds: int, strengths: Optional[Dict[str, float]] = None,
+                         overrides: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    # Time for one partner to do the full station alone, fresh
+    bench = benchmarks.get_benchmarks().category(_solo_reference_key(category))
+    pace_ratio = run_pace_seconds / bench.run_base
+    strengths = strengths or {}
+    overrides = overrides or {}
+    seconds = {}
+    for key in (s["key"] for s in RACE_STATIONS):
+        if key in overrides:
+            seconds[key] = float(overrides[key])
+        else:
+            seconds[key] = bench.get(key) * pace_ratio * float(strengths.get(key, 1.0))
+    return seconds
+
+
+def _normalize_partner(partner: dict, category: str) -> tuple:
+    run_pace = pacer.parse_time_to_seconds(partner["run_pace"])
+    if run_pace <= 0:
+        raise ValueError(f"Invalid run_pace for {partner.get('name') or 'partner'}")
+    for source in ("strengths", "station_seconds"):
+        unknown = set(partner.get(source) or {}) - set(benchmarks.STATION_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown station keys in {source}: {sorted(unknown)}")
+    solo = solo_station_seconds(category, run_pace, partner.get("strengths"), partner.get("station_seconds"))
+    if not all(0 < v <= MAX_STATION_SECONDS for v in solo.values()):
+        raise ValueError(f"Station times must be positive and at most {MAX_STATION_SECONDS}s")
+    # Rounded so near-identical profiles share a cache entry
+    return run_pace, tuple(round(solo[s["key"]], 1) for s in RACE_STATIONS)
+
+
+@metrics.time_operation("partner")
+def optimize(partner_a: dict, partner_b: dict, category: str = "Doubles", roxzone_minutes: Optional[float] = None,
+             transition_seconds: float = DEFAULT_TRANSITION_SECONDS,
+             switches_per_shared_station: int = DEFAULT_SWITCHES_PER_SHARED_STATION,
+             fatigue_rate: float = DEFAULT_FATIGUE_RATE) -> dict:
+    # Written so NaN fails too
+    if not 1.0 <= fatigue_rate <= MAX_FATIGUE_RATE:
+        raise ValueError(f"fatigue_rate must be between 1.0 and {MAX_FATIGUE_RATE}")
+    if not 0 <= transition_seconds <= MAX_TRANSITION_SECONDS or switches_per_shared_station < 0:
+        raise ValueError(f"Transition costs must be non-negative (at most {MAX_TRANSITION_SECONDS}s per handoff)")
+    if roxzone_minutes is not None and not roxzone_minutes <= MAX_ROXZONE_MINUTES:
+        raise ValueError(f"roxzone_minutes must be at most {MAX_ROXZONE_MINUTES}")
+
+    run_a, solo_a = _normalize_partner(partner_a, category)
+    run_b, solo_b = _normalize_partner(partner_b, category)
+    key = (run_a, solo_a, run_b, solo_b, float(transition_seconds),
+           int(switches_per_shared_station), float(fatigue_rate), benchmarks.get_benchmarks().version)
+
+    plan = plan_cache.get(key)
+    if plan is None:
+        plan = _solve(run_a, solo_a, run_b, solo_b, transition_seconds, switches_per_shared_station, fatigue_rate)
+        plan_cache.set(key, plan)
+
+    # Roxzone doesn't change the split, so it's added outside the cached plan
+    roxzone_seconds = _roxzone_seconds(plan["race_seconds"], category, roxzone_minutes)
+    total = plan["race_seconds"] + roxzone_seconds
+    names = {"A": partner_a.get("name") or "Athlete A", "B": partner_b.get("name") or "Athlete B"}
+    return {
+        "splits": plan["splits"],
+        "roxzone_total_seconds": roxzone_seconds,
+        "total_seconds": total,
+        "total_formatted": pacer.format_seconds_to_time(total),
+        "work_seconds": plan["work_seconds"],
+        "athlete_names": names,
+    }
+
+
+def _roxzone_seconds(race_seconds: int, category: str, roxzone_minutes: Optional[float]) -> int:
+    if roxzone_minutes and roxzone_minutes > 0:
+        return pacer.default_roxzone_seconds(race_seconds, category, roxzone_minutes)
+    # Same default as calculate_splits, a share of the finish time (plus tag transitions for
+    # doubles), but here the finish time includes the roxzone itself: iterate to the fixed point.
+    # The default is non-decreasing in the total, so this climbs from 0 and stops.
+    roxzone_seconds = 0
+    while True:
+        estimate = pacer.default_roxzone_seconds(race_seconds + roxzone_seconds, category)
+        if estimate == roxzone_seconds:
+            return roxzone_seconds
+        roxzone_seconds = estimate
+
+
+def _solve(run_a, solo_a, run_b, solo_b, transition_seconds, switches, fatigue_rate) -> dict:
+    n_stations = len(RACE_STATIONS)
+    max_load = n_stations * WORK_STEPS
+    switch_cost = transition_seconds * switches
+    # fatigue[l]: multiplier after l tenths of a station of work
+    fatigue = [fatigue_rate ** (l / WORK_STEPS) for l in range(max_load + 1)]
+
+    # best[k][la]: minimal time from run k+1 to the finish, given A has done la units
+    inf = float("inf")
+    best = [[inf] * (max_load + 1) for _ in range(n_stations + 1)]
+    choice = [[0] * (max_load + 1) for _ in range(n_stations)]
+    best[n_stations] = [0.0] * (max_load + 1)
+
+    for k in range(n_stations - 1, -1, -1):
+        done = k * WORK_STEPS # total units done before station k
+        for la in range(done + 1):
+            lb = done - la
+            fa, fb = fatigue[la], fatigue[lb]
+            run = max(run_a * fa, run_b * fb)
+            station_a = solo_a[k] * fa / WORK_STEPS
+            station_b = solo_b[k] * fb / WORK_STEPS
+            for units_a in range(WORK_STEPS + 1):
+                units_b = WORK_STEPS - units_a
+                cost = run + station_a * units_a + station_b * units_b
+                if 0 < units_a < WORK_STEPS:
+                    cost += switch_cost
+                total = cost + best[k + 1][la + units_a]
+                if total < best[k][la]:
+                    best[k][la] = total
+                    choice[k][la] = units_a
+
+    # Walk the optimal policy forward
+    splits = []
+    la = 0
+    work_a = work_b = 0.0
+    for k in range(n_stations):
+        lb = k * WORK_STEPS - la
+        fa, fb = fatigue[la], fatigue[lb]
+        run = int(round(max(run_a * fa, run_b * fb)))
+        splits.append({
+            "station": RACE_RUNS[k]["name"],
+            "type": "run",
+            "suggested_time_seconds": run,
+            "suggested_time_formatted": pacer.format_mmss(run),
+        })
+
+        units_a = choice[k][la]
+        units_b = WORK_STEPS - units_a
+        seconds_a = solo_a[k] * fa * units_a / WORK_STEPS
+        seconds_b = solo_b[k] * fb * units_b / WORK_STEPS
+        station = seconds_a + seconds_b + (switch_cost if 0 < units_a < WORK_STEPS else 0)
+        work_a += seconds_a
+        work_b += seconds_b
+        percent_a = units_a * 100 // WORK_STEPS
+        splits.append({
+            "station": RACE_STATIONS[k]["name"],
+            "type": "exercise",
+            "suggested_time_seconds": int(round(station)),
+            "suggested_time_formatted": pacer.format_mmss(int(round(station))),
+            "workSplit": {"A": percent_a, "B": 100 - percent_a},
+            "starts": "A" if units_a >= units_b else "B",
+        })
+        la += units_a
+
+    return {
+        "splits": splits,
+        "race_seconds": int(round(best[0][0])),
+        "work_seconds": {"A": int(round(work_a)), "B": int(round(work_b))},
+    }
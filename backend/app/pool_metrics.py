@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Connection pool instrumentation. Lifecycle counters come from SQLAlchemy pool
+# events; checkout latency (queue wait + connect + pre-ping) is timed around
+# Pool.connect(), since there is no "checkout requested" event. All numbers are
+# per process: with several uvicorn workers each one has its own pool.
+
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class PoolMetrics:
+    def __init__(self, name: str, max_overflow: int = -1):
+        self.name = name
+        self.max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.closes = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+
+    def attach(self, pool):
+        self.pool = pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        event.listen(pool, "close", self._on_close)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.closes += 1
+
+    def at_capacity(self, pool) -> bool:
+        # No idle connection and no overflow room left: the checkout has to queue
+        if self.max_overflow < 0 or not isinstance(pool, QueuePool):
+            return False
+        return pool.checkedin() == 0 and pool.overflow() >= self.max_overflow
+
+    def observe_checkout(self, elapsed_ms: float, waited: bool, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.latency_counts[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+                self.latency_ms_total += elapsed_ms
+                self.latency_ms_max = max(self.latency_ms_max, elapsed_ms)
+            if waited:
+                self.waits += 1
+                self.wait_ms_total += elapsed_ms
+                self.wait_ms_max = max(self.wait_ms_max, elapsed_ms)
+
+    def snapshot(self, config: Optional[dict] = None) -> dict:
+        pool = self.pool
+        queue_pool = isinstance(pool, QueuePool)
+        with self._lock:
+            observed = sum(self.latency_counts)
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.latency_counts):
+                cumulative += count
+                buckets.append({"le_ms": bound if bound is not None else "+Inf", "count": cumulative})
+            return {
+                "name": self.name,
+                "pid": os.getpid(),
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "config": config or {},
+                "size": pool.size() if queue_pool else None,
+                "checked_out": pool.checkedout() if queue_pool else None,
+                "idle": pool.checkedin() if queue_pool else None,
+                "overflow": max(pool.overflow(), 0) if queue_pool else None,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "closes": self.closes,
+                "timeouts": self.timeouts,
+                "waits": {
+                    "count": self.waits,
+                    "total_ms": round(self.wait_ms_total, 3),
+                    "max_ms": round(self.wait_ms_max, 3),
+                },
+                "checkout_latency_ms": {
+                    "count": observed,
+                    "sum": round(self.latency_ms_total, 3),
+                    "avg": round(self.latency_ms_total / observed, 3) if observed else 0.0,
+                    "max": round(self.latency_ms_max, 3),
+                    "buckets": buckets,
+                },
+            }
+
+
+class _TimedCheckout:
+    # Class attribute so pools rebuilt by Pool.recreate() keep reporting to the same metrics
+    metrics: PoolMetrics = None
+
+    def connect(self):
+        metrics = self.metrics
+        waited = metrics.at_capacity(self)
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            metrics.observe_checkout((time.perf_counter() - start) * 1000, waited, timed_out=True)
+            raise
+        metrics.observe_checkout((time.perf_counter() - start) * 1000, waited)
+        return connection
+
+
+def timed_pool_class(metrics: PoolMetrics, is_async: bool = False):
+    base = AsyncAdaptedQueuePool if is_async else QueuePool
+    return type(f"Timed{base.__name__}", (_TimedCheckout, base), {"metrics": metrics})
@@ -0,0 +1,245 @@
+import asyncio
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from . import auth
+
+# Opt-in request profiling for admins.
+# With PROFILING_ENABLED=true, main installs ProfilingMiddleware; otherwise
+# nothing is installed and requests pay nothing. A request is profiled when it
+# carries "X-Profile: sample|cprofile" (or ?profile=...) and an admin token,
+# either its own bearer token or X-Profile-Token, so an admin can profile a
+# request made with another user's session.
+#
+# - sample: a background thread samples every thread's stack each
+#   PROFILE_SAMPLE_INTERVAL_MS and writes folded stacks (flamegraph.pl,
+#   speedscope). It sees threadpool work (sync handlers, DB calls) but also
+#   anything else the process runs at the time.
+# - cprofile: deterministic cProfile of the event-loop thread, saved as a
+#   pstats file. Exact call counts for async code; threadpool work appears
+#   only as the await around it.
+#
+# One profiled request at a time; others run unprofiled. Artifacts go to
+# PROFILE_DIR, keeping the newest PROFILE_MAX_ARTIFACTS.
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/hyrox-profiles")
+PROFILE_MAX_ARTIFACTS = int(os.getenv("PROFILE_MAX_ARTIFACTS", "20"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN_HEADER = "x-profile-token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+MODES = {"1": "sample", "sample": "sample", "cprofile": "cprofile"}
+EXTENSIONS = {"sample": ".folded", "cprofile": ".pstats"}
+PROFILE_ID = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+
+# Leaf frames of threads that are just waiting for work
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, interval: float, max_seconds: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        deadline = time.monotonic() + self.max_seconds
+        names = {}
+        while not self._stop_event.wait(self.interval) and time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(f"thread {names.get(ident, ident)}")
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# --- Artifact ring buffer ---
+
+def _paths(profile_id: str, mode: str):
+    base = os.path.join(PROFILE_DIR, profile_id)
+    return base + EXTENSIONS[mode], base + ".json"
+
+
+def _save(profile_id: str, mode: str, data, meta: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    artifact_path, meta_path = _paths(profile_id, mode)
+    if mode == "cprofile":
+        data.dump_stats(artifact_path)
+    else:
+        with open(artifact_path, "w") as f:
+            f.write(data)
+    meta["bytes"] = os.path.getsize(artifact_path)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    # Ids start with a millisecond timestamp, so name order is age order
+    for old in list_profiles()[PROFILE_MAX_ARTIFACTS:]:
+        for path in _paths(old["id"], old["mode"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[dict]:
+    # Newest first
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except OSError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        if not name.endswith(".json") or not PROFILE_ID.match(name[:-5]):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def artifact_path(profile_id: str) -> Optional[tuple]:
+    # (path, mode) for a listed profile; ids are validated, never joined blindly
+    if not PROFILE_ID.match(profile_id):
+        return None
+    for profile in list_profiles():
+        if profile["id"] == profile_id:
+            path = _paths(profile_id, profile["mode"])[0]
+            return (path, profile["mode"]) if os.path.isfile(path) else None
+    return None
+
+
+# --- Middleware ---
+
+def _requested_mode(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return MODES.get(value.decode("latin-1").strip().lower())
+    if b"profile=" in scope.get("query_string", b""):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        if values:
+            return MODES.get(values[0].strip().lower())
+    return None
+
+
+def _admin_token(scope) -> Optional[str]:
+    headers = dict(scope["headers"])
+    token = headers.get(b"x-profile-token")
+    if token:
+        return token.decode("latin-1").strip()
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, credentials = authorization.partition(" ")
+    return credentials.strip() if scheme.lower() == "bearer" else None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._busy = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = _requested_mode(scope)
+        if mode is None or self._busy.locked():
+            await self.app(scope, receive, send)
+            return
+        token = _admin_token(scope)
+        admin = await auth.admin_for_token(token) if token else None
+        if admin is None or self._busy.locked():
+            await self.app(scope, receive, send)
+            return
+
+        async with self._busy:
+            await self._profile(scope, receive, send, mode, admin)
+
+    async def _profile(self, scope, receive, send, mode: str, admin):
+        profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]
+            await send(message)
+
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            sampler = None
+        else:
+            profiler = None
+            sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000, PROFILE_MAX_SECONDS)
+            sampler.start()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            else:
+                sampler.stop()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            meta = {
+                "id": profile_id,
+                "mode": mode,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", None),
+                "status": status_holder["status"],
+                "duration_ms": round(elapsed_ms, 2),
+                "requested_by": admin.email,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            if sampler is not None:
+                meta["samples"] = sampler.samples
+            data = profiler if profiler is not None else sampler.folded()
+            try:
+                await run_in_threadpool(_save, profile_id, mode, data, meta)
+                print(f"--- PROFILE: {mode} {scope['method']} {scope['path']} -> {profile_id} "
+                      f"({elapsed_ms:.1f} ms) ---", flush=True)
+            except OSError as e:
+                print(f"--- PROFILE ERROR: could not save {profile_id}: {e} ---", flush=True)
@@ -0,0 +1,16 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# orjson-backed JSON response for the pacer endpoints.
+# Handlers return this directly, which also skips FastAPI's jsonable_encoder
+# pass over the splits. For the str/int/list/dict payloads the pacer produces,
+# the bytes match JSONResponse (compact separators, UTF-8, insertion order).
+
+
+class PacerJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
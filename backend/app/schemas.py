@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Union, Dict
 from .models import HyroxCategory, UserRole
 from datetime import datetime
 
@@ -45,6 +45,11 @@ class SimulationCreate(SimulationBase):
     categoria_hyrox: Optional[str] = None
     preferred_run_pace: Optional[str] = None
 
+class SimulationImport(SimulationBase):
+    # One NDJSON line of a history import; ids and share tokens are reassigned
+    categoria_hyrox: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class SimulationResponse(SimulationBase):
     id: int
     user_id: int
@@ -54,6 +59,17 @@ class SimulationResponse(SimulationBase):
     class Config:
         from_attributes = True
 
+class SimulationSummary(BaseModel):
+    # History list row without the json_resultados blob
+    id: int
+    user_id: int
+    tempo_alvo: str
+    created_at: datetime
+    share_token: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 class PacerRequest(BaseModel):
     tempo_alvo: str
     categoria_hyrox: str
@@ -61,6 +77,45 @@ class PacerRequest(BaseModel):
     roxzone_minutes: Optional[float] = None
     is_elite: bool = False
     athlete_level: str = "Competitivo"
+    pacing_mode: str = "heuristic" # "solver" derives the run pace from tempo_alvo
+
+class PacerSimulationRequest(PacerRequest):
+    trials: int = 100000
+    seed: Optional[int] = None
+    station_cv: float = 0.06   # per-station coefficient of variation (cvs: 0 to 0.5)
+    run_cv: float = 0.04
+    roxzone_cv: float = 0.10
+    fatigue_sd: float = 0.005  # std dev of the per-station fatigue rate (0 to 0.05)
+
+class SweepAxis(BaseModel):
+    parameter: str # run_pace (s/km), roxzone_minutes (0 = category default), fatigue_base or athlete_level
+    values: Optional[List[Union[float, str]]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = None
+
+class PacerSweepRequest(BaseModel):
+    base: PacerRequest
+    axes: List[SweepAxis]
+    reconcile: bool = False # True spreads the gap to tempo_alvo like calculate-pacer does
+
+class PartnerProfile(BaseModel):
+    name: Optional[str] = None
+    run_pace: str # per km, "MM:SS"
+    strengths: Optional[Dict[str, float]] = None # station key -> multiplier on the model time (0.9 = 10% faster)
+    station_seconds: Optional[Dict[str, float]] = None # station key -> known solo time, overrides the model
+
+class PartnerOptimizeRequest(BaseModel):
+    partner_a: PartnerProfile
+    partner_b: PartnerProfile
+    categoria_hyrox: str = "Doubles"
+    roxzone_minutes: Optional[float] = None # omitted/0: category default, as in calculate-pacer
+    transition_seconds: float = 5.0 # per handoff, up to 300
+    switches_per_shared_station: int = 3
+    fatigue_rate: float = 1.03 # slowdown per station of work already done, 1.0-1.5
+
+class PacerBatchRequest(BaseModel):
+    items: List[PacerRequest]
 
 
 class RecoveryLogBase(BaseModel):
@@ -71,6 +126,9 @@ class RecoveryLogBase(BaseModel):
 class RecoveryLogCreate(RecoveryLogBase):
     pass
 
+class RecoveryLogImport(RecoveryLogBase):
+    created_at: Optional[datetime] = None
+
 class RecoveryLogResponse(RecoveryLogBase):
     id: int
     user_id: int
@@ -0,0 +1,44 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+
+from . import schemas
+from .cache import LRUCache
+
+# Public share links. A saved simulation never changes after creation, so the
+# serialized response is cached as bytes by share token together with a strong
+# ETag over exactly those bytes. Deleting the simulation evicts the entry; the
+# TTL bounds how long other worker processes, which don't see the eviction,
+# keep serving it.
+
+SHARE_CACHE_SIZE = int(os.getenv("SHARE_CACHE_SIZE", "2048"))
+SHARE_CACHE_TTL = float(os.getenv("SHARE_CACHE_TTL", "300"))
+SHARE_CACHE_MAX_AGE = int(os.getenv("SHARE_CACHE_MAX_AGE", "86400"))
+# Larger bodies are still served, just not kept in memory
+SHARE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("SHARE_CACHE_MAX_ENTRY_BYTES", "262144"))
+
+CACHE_CONTROL = f"public, max-age={SHARE_CACHE_MAX_AGE}"
+
+cache = LRUCache(maxsize=SHARE_CACHE_SIZE, ttl=SHARE_CACHE_TTL, name="share")
+
+
+def serialize(simulation) -> Tuple[bytes, str]:
+    body = schemas.SimulationResponse.model_validate(simulation).model_dump_json().encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag
+
+
+def get(token: str) -> Optional[Tuple[bytes, str]]:
+    return cache.get(token)
+
+
+def put(token: str, simulation) -> Tuple[bytes, str]:
+    entry = serialize(simulation)
+    if len(entry[0]) <= SHARE_CACHE_MAX_ENTRY_BYTES:
+        cache.set(token, entry)
+    return entry
+
+
+def evict(token: Optional[str]):
+    if token:
+        cache.pop(token)
@@ -0,0 +1,197 @@
+import argparse
+import struct
+from typing import Optional, Tuple
+
+from . import pacer
+
+# Compact storage for saved simulations.
+# A plan is 16 station seconds + roxzone + the two erg paces, packed as
+# little-endian uint16 (38 bytes) in a fixed station order. Everything that can
+# be rebuilt from those numbers (station names, types, MM:SS strings) is not
+# stored; anything that can't (client fields like workSplit, hand-edited
+# strings, top-level metadata) goes into a small residual JSON. encode() only
+# accepts a compact form that decodes back to exactly the original payload;
+# anything else stays in the json_resultados blob.
+
+STATIONS = pacer.STATIONS_CONFIG
+ERG_POSITIONS = tuple(i for i, s in enumerate(STATIONS) if s.get("erg"))
+ROXZONE_SLOT = len(STATIONS)
+NOT_PACKED = 0xFFFF  # slot value meaning "not stored in the packed array"
+MAX_PACKED_SECONDS = NOT_PACKED - 1
+PACK_FORMAT = struct.Struct(f"<{len(STATIONS) + 1 + len(ERG_POSITIONS)}H")
+
+
+def _packable(value) -> bool:
+    return type(value) is int and 0 <= value <= MAX_PACKED_SECONDS
+
+
+def _pace_seconds(value) -> int:
+    if not isinstance(value, str):
+        return NOT_PACKED
+    try:
+        seconds = pacer.parse_time_to_seconds(value)
+    except (ValueError, AttributeError):
+        return NOT_PACKED
+    return seconds if _packable(seconds) else NOT_PACKED
+
+
+def _canonical_split(position: int, seconds: int, pace_seconds: int) -> dict:
+    station = STATIONS[position]
+    split = {
+        "station": station["name"],
+        "type": station["type"],
+        "suggested_time_seconds": seconds,
+        "suggested_time_formatted": pacer.format_mmss(seconds),
+    }
+    if pace_seconds != NOT_PACKED:
+        split["pace_per_500m"] = pacer.format_mmss(pace_seconds)
+    return split
+
+
+def decode(packed: bytes, extra: dict) -> dict:
+    values = PACK_FORMAT.unpack(packed)
+    paces = dict(zip(ERG_POSITIONS, values[ROXZONE_SLOT + 1:]))
+    splits = [_canonical_split(i, values[i], paces.get(i, NOT_PACKED)) for i in range(len(STATIONS))]
+    for position, overrides in (extra.get("splits") or {}).items():
+        splits[int(position)].update(overrides)
+    for position, keys in (extra.get("drop") or {}).items():
+        for key in keys:
+            splits[int(position)].pop(key, None)
+
+    payload = {}
+    for key, value in extra["meta"].items():
+        if key == "splits":
+            value = splits
+        elif key == "roxzone_total_seconds" and values[ROXZONE_SLOT] != NOT_PACKED:
+            value = values[ROXZONE_SLOT]
+        payload[key] = value
+    return payload
+
+
+def encode(payload) -> Optional[Tuple[bytes, dict]]:
+    # (packed, extra), or None when the payload doesn't fit the compact form
+    if not isinstance(payload, dict):
+        return None
+    splits = payload.get("splits")
+    if not isinstance(splits, list) or len(splits) != len(STATIONS):
+        return None
+    for split, station in zip(splits, STATIONS):
+        if not isinstance(split, dict) or split.get("station") != station["name"] or split.get("type") != station["type"]:
+            return None
+        if not _packable(split.get("suggested_time_seconds")):
+            return None
+
+    seconds = [split["suggested_time_seconds"] for split in splits]
+    roxzone = payload.get("roxzone_total_seconds", None)
+    roxzone_slot = roxzone if _packable(roxzone) else NOT_PACKED
+    paces = [_pace_seconds(splits[i].get("pace_per_500m")) for i in ERG_POSITIONS]
+    pace_by_position = dict(zip(ERG_POSITIONS, paces))
+
+    overrides, drops = {}, {}
+    for i, split in enumerate(splits):
+        canonical = _canonical_split(i, seconds[i], pace_by_position.get(i, NOT_PACKED))
+        changed = {k: v for k, v in split.items() if k not in canonical or canonical[k] != v}
+        missing = [k for k in canonical if k not in split]
+        if changed:
+            overrides[str(i)] = changed
+        if missing:
+            drops[str(i)] = missing
+
+    # Packed fields keep their key (and so their position) with a null placeholder
+    meta = {}
+    for key, value in payload.items():
+        packed_here = key == "splits" or (key == "roxzone_total_seconds" and roxzone_slot != NOT_PACKED)
+        meta[key] = None if packed_here else value
+    extra = {"meta": meta}
+    if overrides:
+        extra["splits"] = overrides
+    if drops:
+        extra["drop"] = drops
+
+    packed = PACK_FORMAT.pack(*seconds, roxzone_slot, *paces)
+    if decode(packed, extra) != payload:
+        return None
+    return packed, extra
+
+
+def summarize(payload) -> dict:
+    # Indexed summary columns; best effort for payloads that don't compact
+    summary = {"total_seconds": None, "bench_category": None, "athlete_level": None}
+    if not isinstance(payload, dict):
+        return summary
+    splits = payload.get("splits")
+    if isinstance(splits, list) and splits:
+        seconds = [s.get("suggested_time_seconds") if isinstance(s, dict) else None for s in splits]
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in seconds):
+            roxzone = payload.get("roxzone_total_seconds")
+            roxzone = roxzone if isinstance(roxzone, (int, float)) and not isinstance(roxzone, bool) else 0
+            summary["total_seconds"] = int(round(sum(seconds) + roxzone))
+    for key in ("bench_category", "athlete_level"):
+        if isinstance(payload.get(key), str):
+            summary[key] = payload[key][:50]
+    return summary
+
+
+def columns(payload, category: Optional[str] = None) -> dict:
+    # Storage column values for a payload
+    compact = encode(payload)
+    if compact is None:
+        values = {"splits_packed": None, "results_extra": None, "results_blob": payload}
+    else:
+        values = {"splits_packed": compact[0], "results_extra": compact[1], "results_blob": None}
+    summary = summarize(payload)
+    if summary["bench_category"] is None and category:
+        summary["bench_category"] = pacer.get_bench_key(category)
+    values.update(summary)
+    return values
+
+
+def store(simulation, payload, category: Optional[str] = None):
+    # Write payload into a Simulation's storage columns
+    for key, value in columns(payload, category).items():
+        setattr(simulation, key, value)
+
+
+def backfill(batch_size: int = 500) -> dict:
+    # Convert rows still stored as a JSON blob, in id order, one batch per commit
+    from sqlalchemy.orm import joinedload
+    from . import database, models
+
+    stats = {"rows": 0, "compacted": 0, "kept_as_json": 0}
+    last_id = 0
+    while True:
+        db = database.SessionLocal()
+        try:
+            rows = (
+                db.query(models.Simulation)
+                .options(joinedload(models.Simulation.user))
+                .filter(models.Simulation.id > last_id, models.Simulation.splits_packed.is_(None))
+                .order_by(models.Simulation.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                return stats
+            for sim in rows:
+                payload = sim.results_blob
+                category = sim.user.categoria_hyrox.value if sim.user and sim.user.categoria_hyrox else None
+                store(sim, payload, category)
+                stats["rows"] += 1
+                stats["compacted" if sim.splits_packed is not None else "kept_as_json"] += 1
+            last_id = rows[-1].id
+            db.commit()
+            print(f"--- BACKFILL: {stats['rows']} rows (last id {last_id}) ---", flush=True)
+        finally:
+            db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert saved simulations to the compact storage format")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+    stats = backfill(args.batch_size)
+    print(f"--- BACKFILL DONE: {stats} ---", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,14 @@
 # Navegar para a raiz da aplicação no Docker
 cd /app
 
-# Tentar rodar migrações (se o ficheiro existir)
-python3 migrate_db.py || echo "Migrate script não encontrado"
-
-# Tornar o Ricardo Admin (Garante que este script existe em app/set_admin.py)
-python3 app/set_admin.py || echo "Erro ao definir admin"
+# As migrações correm no arranque da app (app/migrations.py, tabela schema_version).
+# Manualmente: python3 -m app.migrations status | upgrade
+# Promover o administrador (só quando necessário): python3 app/set_admin.py
 
+# Um único worker: as caches em memória (utilizadores autenticados, planos, índice de
+# percentis) são por processo. Com mais workers ou réplicas, a desativação de um
+# utilizador só chega aos outros processos ao fim de AUTH_CACHE_TTL segundos
+# (o acesso de admin é sempre verificado na base de dados).
 # Iniciar o Uvicorn apontando para o módulo correto
 # Como estamos em /app e o main está em app/main.py:
 exec uvicorn app.main:app --host 0.0.0.0 --port $PORT
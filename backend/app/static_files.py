@@ -0,0 +1,208 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Built frontend served from memory.
+# At startup the static directory is walked once into a manifest of
+# url path -> bytes, content hash and precompressed gzip/brotli variants
+# (reusing .gz/.br files emitted by the build when present). Requests are a
+# dict lookup: no stat/open per request, and anything that isn't in the
+# manifest (including ../ tricks) simply misses. Hashed /assets/* files are
+# immutable and cached for a year; index.html is revalidated via its ETag.
+
+STATIC_PATH = os.getenv("STATIC_PATH", "/app/static")
+# Bigger files stay on disk and go through FileResponse
+STATIC_MAX_FILE_BYTES = int(os.getenv("STATIC_MAX_FILE_BYTES", str(8 * 1024 * 1024)))
+STATIC_GZIP_LEVEL = int(os.getenv("STATIC_GZIP_LEVEL", "9"))
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+
+ASSETS_PREFIX = "assets/"
+INDEX = "index.html"
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+CACHE_DEFAULT = "public, max-age=3600"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/xml", "application/manifest+json", "application/wasm")
+MIN_COMPRESS_BYTES = 256
+# Preference order when the client accepts several
+ENCODINGS = ("br", "gzip")
+
+
+class StaticFile(NamedTuple):
+    path: str
+    content_type: str
+    cache_control: str
+    body: Optional[bytes]           # None when too large to keep in memory
+    etag: str
+    variants: Dict[str, bytes]      # content-encoding -> compressed body
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _cache_control(url_path: str) -> str:
+    if url_path.startswith(ASSETS_PREFIX):
+        return CACHE_IMMUTABLE
+    if url_path == INDEX:
+        return CACHE_REVALIDATE
+    return CACHE_DEFAULT
+
+
+def _read(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _variants(full_path: str, body: bytes, content_type: str) -> Dict[str, bytes]:
+    if len(body) < MIN_COMPRESS_BYTES or not _compressible(content_type):
+        return {}
+    variants = {}
+    gz = _read(full_path + ".gz")
+    if gz is None:
+        gz = gzip.compress(body, compresslevel=STATIC_GZIP_LEVEL, mtime=0)
+    variants["gzip"] = gz
+    br = _read(full_path + ".br")
+    if br is None and brotli is not None:
+        br = brotli.compress(body, quality=STATIC_BROTLI_QUALITY)
+    if br is not None:
+        variants["br"] = br
+    # Only keep variants that actually save bytes
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            accepted.add(token)
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip() for tag in header.split(",")}
+    return etag in tags or f"W/{etag}" in tags
+
+
+class StaticManifest:
+    def __init__(self):
+        self.root = None
+        self.files: Dict[str, StaticFile] = {}
+
+    def load(self, root: str = STATIC_PATH):
+        files = {}
+        if os.path.isdir(root):
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    full_path = os.path.join(dirpath, filename)
+                    url_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+                    # Build-time compressed siblings are folded into their original
+                    if filename.endswith((".gz", ".br")) and os.path.isfile(full_path[:-3]):
+                        continue
+                    entry = self._load_file(full_path, url_path)
+                    if entry is not None:
+                        files[url_path] = entry
+        self.root = root
+        self.files = files
+        stats = self.stats()
+        print(f"--- STATIC: {stats['files']} files, {stats['bytes']} bytes "
+              f"(gzip {stats['gzip_bytes']}, br {stats['br_bytes']}) from {root} ---", flush=True)
+
+    def _load_file(self, full_path: str, url_path: str) -> Optional[StaticFile]:
+        content_type = mimetypes.guess_type(url_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        try:
+            size = os.path.getsize(full_path)
+        except OSError:
+            return None
+        if size > STATIC_MAX_FILE_BYTES:
+            digest = hashlib.sha256()
+            with open(full_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            body, variants = None, {}
+        else:
+            body = _read(full_path)
+            if body is None:
+                return None
+            digest = hashlib.sha256(body)
+            variants = _variants(full_path, body, content_type)
+        return StaticFile(
+            path=full_path,
+            content_type=content_type,
+            cache_control=_cache_control(url_path),
+            body=body,
+            etag='"' + digest.hexdigest()[:32] + '"',
+            variants=variants,
+        )
+
+    def lookup(self, url_path: str) -> Optional[StaticFile]:
+        return self.files.get(url_path)
+
+    @property
+    def index(self) -> Optional[StaticFile]:
+        return self.files.get(INDEX)
+
+    def respond(self, request: Request, entry: StaticFile) -> Response:
+        headers = {"Cache-Control": entry.cache_control}
+        etag = entry.etag
+        body = entry.body
+        if entry.variants:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+            for encoding in ENCODINGS:
+                if encoding in accepted and encoding in entry.variants:
+                    # Each representation gets its own strong validator
+                    etag = f'"{entry.etag[1:-1]}-{encoding}"'
+                    body = entry.variants[encoding]
+                    headers["Content-Encoding"] = encoding
+                    break
+        headers["ETag"] = etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        if body is None:
+            return FileResponse(entry.path, media_type=entry.content_type, headers=headers)
+        return Response(content=body, media_type=entry.content_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "files": len(self.files),
+            "bytes": sum(len(f.body) for f in self.files.values() if f.body is not None),
+            "gzip_bytes": sum(len(f.variants.get("gzip", b"")) for f in self.files.values()),
+            "br_bytes": sum(len(f.variants.get("br", b"")) for f in self.files.values()),
+            "brotli_available": brotli is not None,
+        }
+
+
+manifest = StaticManifest()
@@ -0,0 +1,108 @@
+import re
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from . import models, pagination
+
+# Admin user lookup. A search term matches an email prefix (a range scan on the
+# unique email index) or a name. On MySQL names go through the ngram FULLTEXT
+# index ft_users_full_name, so any substring of 2+ characters hits the index
+# instead of a LIKE '%q%' scan. SQLite has no FULLTEXT; it keeps substring
+# LIKE matching, which is fine at dev/test sizes.
+#
+# The two matches run as separate queries, each able to use its own index, and
+# are merged by id. Pages are keyset on id. Filtered totals are counted over at
+# most COUNT_CAP ids per branch, so they stay cheap; a total that hits the cap
+# is a lower bound and flagged as capped. The unfiltered total comes from the
+# table statistics on MySQL (flagged as an estimate) and from COUNT(*) elsewhere.
+
+DEFAULT_ADMIN_PAGE_SIZE = 100
+COUNT_CAP = 1000
+NGRAM_TOKEN_SIZE = 2  # MySQL's default ngram_token_size
+_FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _after(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    values = pagination.decode_cursor(cursor)
+    try:
+        return int(values[0])
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _table_rows(db: Session) -> Optional[int]:
+    # InnoDB's row estimate: no scan, but can be off by a few tens of percent
+    return db.execute(text(
+        "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+    ), {"name": models.User.__tablename__}).scalar()
+
+
+def _total(db: Session, q: str, role: Optional[models.UserRole], branches: list) -> dict:
+    if not q and not role:
+        if db.get_bind().dialect.name != "mysql":
+            return {"count": db.query(func.count(models.User.id)).scalar(), "estimate": False, "capped": False}
+        rows = _table_rows(db)
+        if rows is not None:
+            return {"count": int(rows), "estimate": True, "capped": False}
+
+    matched = set()
+    capped = False
+    for branch in branches:
+        rows = branch.order_by(models.User.id).limit(COUNT_CAP).all()
+        capped = capped or len(rows) >= COUNT_CAP
+        matched.update(row.id for row in rows)
+    return {"count": len(matched), "estimate": False, "capped": capped}
+
+
+def _branches(db: Session, q: Optional[str], role: Optional[models.UserRole]) -> list:
+    # Each branch is an id-ordered query that can be served by one index
+    base = db.query(models.User.id)
+    if role:
+        base = base.filter(models.User.role == role)
+    if not q:
+        return [base]
+
+    branches = [base.filter(models.User.email.like(_escape_like(q) + "%", escape="\\"))]
+    if db.get_bind().dialect.name == "mysql":
+        terms = _FULLTEXT_OPERATORS.sub(" ", q).strip()
+        if len(terms) >= NGRAM_TOKEN_SIZE:
+            # Quoted: the ngram parser turns the phrase into consecutive-ngram matching
+            branches.append(base.filter(models.User.full_name.match(f'"{terms}"')))
+    else:
+        branches.append(base.filter(models.User.full_name.contains(q, autoescape=True)))
+    return branches
+
+
+def search_users(db: Session, q: Optional[str] = None, role: Optional[models.UserRole] = None,
+                 limit: int = DEFAULT_ADMIN_PAGE_SIZE, cursor: Optional[str] = None,
+                 with_total: bool = True) -> Tuple[List[models.User], Optional[str], Optional[dict]]:
+    q = (q or "").strip()
+    after = _after(cursor)
+    branches = _branches(db, q, role)
+
+    ids = set()
+    for branch in branches:
+        rows = branch.filter(models.User.id > after).order_by(models.User.id).limit(limit + 1).all()
+        ids.update(row.id for row in rows)
+    page_ids = sorted(ids)[:limit + 1]
+
+    next_cursor = None
+    if len(page_ids) > limit:
+        page_ids = page_ids[:limit]
+        next_cursor = pagination.encode_cursor(page_ids[-1])
+
+    users = []
+    if page_ids:
+        users = db.query(models.User).filter(models.User.id.in_(page_ids)).order_by(models.User.id).all()
+
+    total = _total(db, q, role, branches) if with_total else None
+    return users, next_cursor, total
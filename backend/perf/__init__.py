@@ -0,0 +1,2 @@
+# Performance suite: microbenchmarks plus an in-process ASGI load generator
+# against a seeded SQLite database. Run from backend/: python -m perf --help
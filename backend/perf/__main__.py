@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# python -m perf [--save-baseline] [--tolerance 0.2] ...
+#
+# Runs the microbenchmarks and the load scenarios, prints a report and compares
+# it with a baseline JSON. Exits 1 when a benchmark regressed by more than the
+# tolerance: ns/op for microbenchmarks, the chosen latency percentile and
+# throughput for load scenarios. Baselines are only comparable on the same
+# machine with the same settings; the settings are stored alongside them, and
+# none is committed. Without a baseline (and without --save-baseline) the run
+# exits 2, so a missing baseline can't pass as "no regressions".
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m perf", description="Hyrox Pacer Pro performance suite")
+    parser.add_argument("--suite", choices=("all", "micro", "load"), default="all")
+    parser.add_argument("--only", nargs="*", help="Benchmark/scenario names to run (default: all)")
+    parser.add_argument("--users", type=int, default=200, help="Seeded users")
+    parser.add_argument("--simulations-per-user", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--slow-requests", type=int, default=50,
+                        help="Measured requests for the bcrypt-bound scenarios (signup, login)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--db-mode", choices=("sync", "async"), default="sync")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="bcrypt cost for the run (production uses 12; 4 keeps signup/login runs short)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--output", help="Also write this run's report to a JSON file")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("PERF_TOLERANCE", "0.20")),
+                        help="Allowed relative slowdown before failing (0.20 = 20%%)")
+    parser.add_argument("--tolerance-for", action="append", default=[], metavar="NAME=TOL",
+                        help="Per-benchmark tolerance, e.g. load.signup=0.5 (repeatable)")
+    parser.add_argument("--latency-metric", choices=("p50_ms", "p95_ms", "p99_ms"), default="p95_ms")
+    parser.add_argument("--noise-floor-ms", type=float, default=0.5,
+                        help="Ignore load latency regressions smaller than this in absolute terms")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args) -> str:
+    # Must run before anything imports app.*: the app reads its config at import time
+    db_path = os.path.join(tempfile.mkdtemp(prefix="hyrox-perf-"), "perf.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["DB_MODE"] = args.db_mode
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ["PROFILING_ENABLED"] = "false"
+    os.environ.setdefault("STATIC_PATH", os.path.join(os.path.dirname(db_path), "static"))
+    os.environ["COHORT_SNAPSHOT_PATH"] = os.path.join(os.path.dirname(db_path), "cohorts.snapshot")
+    # Seeded admin search and history reads must not hit the N+1 log on every request
+    os.environ.setdefault("DB_QUERY_BUDGET", "1000")
+    return db_path
+
+
+def settings(args) -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "db_mode": args.db_mode,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "users": args.users,
+        "simulations_per_user": args.simulations_per_user,
+        "requests": args.requests,
+        "slow_requests": args.slow_requests,
+        "concurrency": args.concurrency,
+    }
+
+
+def compare(report: dict, baseline: dict, args) -> list:
+    overrides = {}
+    for item in args.tolerance_for:
+        name, _, value = item.partition("=")
+        overrides[name] = float(value)
+
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        current = report["results"].get(name)
+        if current is None:
+            continue
+        tolerance = overrides.get(name, args.tolerance)
+        if name.startswith("micro."):
+            checks = [("ns_per_op", True, 0.0)]
+        else:
+            checks = [(args.latency_metric, True, args.noise_floor_ms), ("rps", False, 0.0)]
+        for metric, higher_is_worse, floor in checks:
+            if metric not in base or not base[metric]:
+                continue
+            before, after = base[metric], current[metric]
+            change = (after - before) / before
+            worse = change > tolerance if higher_is_worse else -change > tolerance
+            if worse and abs(after - before) >= floor:
+                regressions.append(f"{name} {metric}: {before} -> {after} ({change:+.1%}, tolerance {tolerance:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = configure_environment(args)
+
+    from . import load, micro
+
+    only = set(args.only) if args.only else None
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "settings": settings(args), "results": {}}
+    print(f"--- PERF: {report['settings']} (db {db_path}) ---", flush=True)
+
+    if args.suite in ("all", "micro"):
+        for name, result in micro.run(only).items():
+            report["results"][f"micro.{name}"] = result
+    if args.suite in ("all", "load"):
+        results = load.run(
+            users=args.users,
+            simulations_per_user=args.simulations_per_user,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            only=only,
+            slow_requests=args.slow_requests,
+        )
+        for name, result in results.items():
+            report["results"][f"load.{name}"] = result
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed_requests = [name for name, r in report["results"].items() if r.get("errors")]
+    if failed_requests:
+        print(f"--- PERF: scenarios with failed requests: {', '.join(failed_requests)} ---", flush=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"--- PERF: baseline written to {args.baseline} ---", flush=True)
+        sys.exit(1 if failed_requests else 0)
+
+    if not os.path.exists(args.baseline):
+        print(f"--- PERF ERROR: no baseline at {args.baseline}; run with --save-baseline to create one ---", flush=True)
+        sys.exit(2)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print(f"--- PERF WARNING: baseline settings differ: {baseline.get('settings')} ---", flush=True)
+    regressions = compare(report, baseline, args)
+    for line in regressions:
+        print(f"--- PERF REGRESSION: {line} ---", flush=True)
+    if not regressions:
+        print(f"--- PERF: no regressions against {args.baseline} ---", flush=True)
+    sys.exit(1 if regressions or failed_requests else 0)
+
+
+if __name__ == "__main__":
+    main()
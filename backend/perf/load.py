@@ -0,0 +1,318 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import math
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+# In-process load generator. Requests are ASGI calls straight into app.main:app
+# (no sockets, no HTTP client), so the numbers measure the application:
+# routing, auth, validation, the pacer, SQL and serialization. The database is
+# a throwaway SQLite file seeded before the run.
+
+PASSWORD = "perf-password"
+
+
+# --- Minimal ASGI client ---
+
+class ASGIClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, url: str, headers: Optional[dict] = None, body: bytes = b"",
+                      json_body=None, form: Optional[dict] = None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["content-type"] = "application/json"
+        elif form is not None:
+            body = urlencode(form).encode()
+            headers["content-type"] = "application/x-www-form-urlencoded"
+        headers["content-length"] = str(len(body))
+        path, _, query = url.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("127.0.0.1", 50000),
+            "server": ("perf", 80),
+        }
+        done = asyncio.Event()
+        sent_body = False
+        status = 500
+        chunks = []
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status, b"".join(chunks)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Runs the app's startup/shutdown handlers (migrations, benchmark registry, ...)
+    to_app: asyncio.Queue = asyncio.Queue()
+    from_app: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+                                     to_app.get, from_app.put))
+    await to_app.put({"type": "lifespan.startup"})
+    message = await from_app.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"App startup failed: {message}")
+    try:
+        yield
+    finally:
+        await to_app.put({"type": "lifespan.shutdown"})
+        await from_app.get()
+        await task
+
+
+# --- Seed data ---
+
+class Context:
+    def __init__(self, client: ASGIClient):
+        self.client = client
+        self.run_id = uuid.uuid4().hex[:8]
+        self.user_tokens: List[str] = []
+        self.user_emails: List[str] = []
+        self.admin_token = None
+        self.share_tokens: List[str] = []
+        self.plan = None
+        self.created_ids: List[Tuple[str, int]] = []
+
+    def auth(self, i: int) -> dict:
+        return {"authorization": f"Bearer {self.user_tokens[i % len(self.user_tokens)]}"}
+
+
+def seed(ctx: Context, users: int, simulations_per_user: int):
+    from datetime import datetime, timedelta
+
+    from app import auth, cohorts, crud, database, models, pacer_cache, simulation_codec
+
+    password_hash = auth.get_password_hash(PASSWORD)
+    plans = [pacer_cache.calculate_splits(f"01:{20 + i:02d}:00", "Open") for i in range(40)]
+    ctx.plan = plans[10]
+    first_names = ("Ana", "Bruno", "Carla", "Diogo", "Eva", "Filipe", "Gabriela", "Hugo", "Ines", "Joao")
+    now = datetime.utcnow()
+
+    db = database.SessionLocal()
+    try:
+        user_rows = [
+            {
+                "email": f"user{i}@perf.hyrox.com",
+                "password_hash": password_hash,
+                "full_name": f"{first_names[i % len(first_names)]} Perf{i}",
+                "role": models.UserRole.USER,
+                "is_active": True,
+                "categoria_hyrox": models.HyroxCategory.OPEN,
+            }
+            for i in range(users)
+        ]
+        db.execute(models.User.__table__.insert(), user_rows)
+        db.commit()
+        ids = [row.id for row in db.query(models.User.id).filter(models.User.email.like("%@perf.hyrox.com")).order_by(models.User.id)]
+
+        rows = []
+        for n, user_id in enumerate(ids):
+            for j in range(simulations_per_user):
+                plan = plans[(n + j) % len(plans)]
+                token = str(uuid.uuid4())
+                rows.append({
+                    "user_id": user_id,
+                    "tempo_alvo": plan["target_time"],
+                    "created_at": now - timedelta(minutes=n * simulations_per_user + j),
+                    "share_token": token,
+                    **simulation_codec.columns(plan, "Open"),
+                })
+                if j == 0:
+                    ctx.share_tokens.append(token)
+            if len(rows) >= 2000:
+                crud.insert_simulations(db, rows)
+                rows = []
+        if rows:
+            crud.insert_simulations(db, rows)
+    finally:
+        db.close()
+    # Seed rows bypass the request path; index them the way an offline rebuild would
+    cohorts.index.rebuild()
+
+    ctx.user_emails = [row["email"] for row in user_rows]
+    ctx.user_tokens = [auth.create_access_token({"sub": email}, timedelta(hours=2)) for email in ctx.user_emails]
+    ctx.admin_token = auth.create_access_token({"sub": "admin@hyrox.com"}, timedelta(hours=2))
+
+
+# --- Scenarios: (ctx, i) -> status ---
+
+async def signup(ctx: Context, i: int) -> int:
+    status, _ = await ctx.client.request("POST", "/api/signup", json_body={
+        "email": f"new{ctx.run_id}-{i}@perf.hyrox.com", "password": PASSWORD, "full_name": f"New Perf{i}"})
+    return status
+
+
+async def login(ctx: Context, i: int) -> int:
+    status, _ = await ctx.client.request("POST", "/api/login", form={
+        "username": ctx.user_emails[i % len(ctx.user_emails)], "password": PASSWORD})
+    return status
+
+
+async def calculate_pacer(ctx: Context, i: int) -> int:
+    # 120 distinct targets: mostly plan-cache hits once warm, like production
+    status, _ = await ctx.client.request("POST", "/api/calculate-pacer", json_body={
+        "tempo_alvo": f"{1 + (i % 120) // 60:02d}:{(i % 120) % 60:02d}:00", "categoria_hyrox": "Open"})
+    return status
+
+
+async def simulations_create(ctx: Context, i: int) -> int:
+    status, body = await ctx.client.request("POST", "/api/simulations", headers=ctx.auth(i), json_body={
+        "tempo_alvo": ctx.plan["target_time"], "json_resultados": ctx.plan, "categoria_hyrox": "Open"})
+    if status == 200:
+        ctx.created_ids.append((ctx.auth(i)["authorization"], json.loads(body)["id"]))
+    return status
+
+
+async def simulations_list(ctx: Context, i: int) -> int:
+    status, _ = await ctx.client.request("GET", "/api/simulations/me?limit=50", headers=ctx.auth(i))
+    return status
+
+
+async def simulations_summary(ctx: Context, i: int) -> int:
+    status, _ = await ctx.client.request("GET", "/api/simulations/me/summary?limit=50", headers=ctx.auth(i))
+    return status
+
+
+async def simulations_delete(ctx: Context, i: int) -> int:
+    if not ctx.created_ids:
+        await simulations_create(ctx, i)
+    authorization, simulation_id = ctx.created_ids.pop()
+    status, _ = await ctx.client.request("DELETE", f"/api/simulations/{simulation_id}",
+                                         headers={"authorization": authorization})
+    return status
+
+
+async def share(ctx: Context, i: int) -> int:
+    status, _ = await ctx.client.request("GET", f"/api/share/{ctx.share_tokens[i % len(ctx.share_tokens)]}")
+    return status
+
+
+async def admin_search(ctx: Context, i: int) -> int:
+    q = ("user1", "Perf", "ana", "Hugo Perf")[i % 4]
+    status, _ = await ctx.client.request("GET", f"/api/admin/users?{urlencode({'q': q, 'limit': 50})}",
+                                         headers={"authorization": f"Bearer {ctx.admin_token}"})
+    return status
+
+
+async def cohort_percentile(ctx: Context, i: int) -> int:
+    status, _ = await ctx.client.request("GET", "/api/cohorts/percentile?" + urlencode({
+        "categoria_hyrox": "Open", "tempo_alvo": f"01:{20 + i % 40:02d}:00", "metric": ("total", "ski erg")[i % 2]}))
+    return status
+
+
+SCENARIOS: Dict[str, Callable[[Context, int], Awaitable[int]]] = {
+    "signup": signup,
+    "login": login,
+    "calculate_pacer": calculate_pacer,
+    "simulations_create": simulations_create,
+    "simulations_list": simulations_list,
+    "simulations_summary": simulations_summary,
+    "simulations_delete": simulations_delete,
+    "share": share,
+    "admin_search": admin_search,
+    "cohort_percentile": cohort_percentile,
+}
+
+
+# --- Runner ---
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest-rank
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(ctx: Context, fn, requests: int, concurrency: int, warmup: int) -> dict:
+    for i in range(warmup):
+        await fn(ctx, i)
+
+    counter = itertools.count(warmup)
+    end = warmup + requests
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= end:
+                return
+            start = time.perf_counter()
+            status = await fn(ctx, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not 200 <= status < 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+async def run_async(users: int, simulations_per_user: int, requests: int, concurrency: int, warmup: int,
+                    only=None, slow_requests: Optional[int] = None) -> Dict[str, dict]:
+    from app.main import app
+
+    results = {}
+    async with lifespan(app):
+        ctx = Context(ASGIClient(app))
+        seed(ctx, users, simulations_per_user)
+        for name, fn in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            # bcrypt-bound scenarios are orders of magnitude slower; keep their run short
+            count = slow_requests if slow_requests and name in ("signup", "login") else requests
+            results[name] = await run_scenario(ctx, fn, count, concurrency, min(warmup, count))
+            r = results[name]
+            print(f"  load  {name:<22} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+                  f"p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}", flush=True)
+    return results
+
+
+def run(**kwargs) -> Dict[str, dict]:
+    return asyncio.run(run_async(**kwargs))
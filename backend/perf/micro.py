@@ -0,0 +1,75 @@
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+# Microbenchmarks for the hot paths behind /api/calculate-pacer and the
+# simulation endpoints. Each benchmark is calibrated to run for about
+# MIN_REPEAT_SECONDS per repeat; the best repeat is reported (least noise).
+
+MIN_REPEAT_SECONDS = 0.2
+REPEATS = 5
+
+
+def bench(fn: Callable[[], object], repeats: int = REPEATS, min_seconds: float = MIN_REPEAT_SECONDS) -> dict:
+    fn()  # warm caches and imports
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds / 4 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * (min_seconds / max(elapsed, 1e-9))))
+
+    per_op = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_op.append((time.perf_counter() - start) / loops * 1e9)
+    return {
+        "ns_per_op": round(min(per_op), 1),
+        "median_ns_per_op": round(statistics.median(per_op), 1),
+        "loops": loops,
+        "repeats": repeats,
+    }
+
+
+def benchmarks() -> Dict[str, Callable[[], object]]:
+    from app import models, pacer, pacer_batch, pacer_cache, responses, schemas, simulation_codec
+
+    plan = pacer.calculate_splits("01:30:00", "Open")
+    packed, extra = simulation_codec.encode(plan)
+    simulation = models.Simulation(id=1, user_id=1, tempo_alvo="01:30:00", share_token="perf",
+                                  created_at=datetime(2026, 1, 1))
+    simulation_codec.store(simulation, plan, "Open")
+    pacer_cache.calculate_splits("01:30:00", "Open")
+    batch_times = [f"01:{20 + i % 40:02d}:00" for i in range(100)]
+
+    return {
+        "parse_time_to_seconds": lambda: pacer.parse_time_to_seconds("01:30:00"),
+        "calculate_splits": lambda: pacer.calculate_splits("01:30:00", "Open"),
+        "calculate_splits_solver": lambda: pacer.calculate_splits("01:30:00", "Open", pacing_mode="solver"),
+        "calculate_splits_cached": lambda: pacer_cache.calculate_splits("01:30:00", "Open"),
+        "calculate_splits_batch_100": lambda: pacer_batch.calculate_splits_batch(
+            batch_times, ["Open"] * 100, [None] * 100, [None] * 100, [False] * 100, ["Competitivo"] * 100),
+        "serialize_plan_orjson": lambda: responses.PacerJSONResponse(plan).body,
+        "serialize_plan_stdlib_json": lambda: json.dumps(plan, separators=(",", ":"), ensure_ascii=False).encode(),
+        "serialize_simulation_response": lambda: schemas.SimulationResponse.model_validate(simulation).model_dump_json(),
+        "codec_encode": lambda: simulation_codec.encode(plan),
+        "codec_decode": lambda: simulation_codec.decode(packed, extra),
+    }
+
+
+def run(only=None) -> Dict[str, dict]:
+    results = {}
+    for name, fn in benchmarks().items():
+        if only and name not in only:
+            continue
+        results[name] = bench(fn)
+        print(f"  micro {name:<32} {results[name]['ns_per_op'] / 1000:>10.2f} us/op", flush=True)
+    return results
@@ -3,7 +3,7 @@ import requests
 import json
 
 def test_pacer():
-    url = "http://localhost:8000/calculate-pacer"
+    url = "http://localhost:8000/api/calculate-pacer"
     
     # Test case: Target 01:30:00, Pace 06:00
     # 6 mins/km * 8 = 48 mins running.
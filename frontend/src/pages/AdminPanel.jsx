@@ -12,21 +12,32 @@ const AdminPanel = () => {
     const [loading, setLoading] = useState(true);
     const [searchQuery, setSearchQuery] = useState('');
     const [roleFilter, setRoleFilter] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [totalLabel, setTotalLabel] = useState('');
 
     // Modals
     const [showDeleteModal, setShowDeleteModal] = useState(null);
     const [showResetModal, setShowResetModal] = useState(null);
     const [resetResponse, setResetResponse] = useState(null);
 
-    const fetchUsers = async () => {
-        setLoading(true);
+    const fetchUsers = async (cursor = null) => {
+        if (!cursor) setLoading(true);
         try {
             const params = {};
             if (roleFilter) params.role = roleFilter;
             if (searchQuery) params.q = searchQuery;
+            if (cursor) params.cursor = cursor;
 
             const response = await api.get('/admin/users', { params });
-            setUsers(response.data);
+            setUsers(prev => cursor ? [...prev, ...response.data] : response.data);
+            setNextCursor(response.headers['x-next-cursor'] || null);
+            const total = response.headers['x-total-count'];
+            if (total !== undefined) {
+                // Capped: a lower bound; estimate: from table statistics
+                if (response.headers['x-total-count-capped'] === 'true') setTotalLabel(`${total}+`);
+                else if (response.headers['x-total-count-estimate'] === 'true') setTotalLabel(`~${total}`);
+                else setTotalLabel(total);
+            }
         } catch (error) {
             console.error("Error fetching users:", error);
         } finally {
@@ -95,6 +106,11 @@ const AdminPanel = () => {
                         <h1 className="text-5xl md:text-6xl font-black italic text-white uppercase tracking-tighter leading-tight">
                             ADMIN <span className="text-orange-500">PANEL</span>
                         </h1>
+                        {totalLabel && (
+                            <p className="mt-2 text-[10px] font-black uppercase tracking-widest text-gray-500 italic">
+                                {totalLabel} utilizadores
+                            </p>
+                        )}
                     </div>
 
                     <div className="flex flex-col md:flex-row gap-4">
@@ -224,6 +240,14 @@ const AdminPanel = () => {
                                 ))}
                             </tbody>
                         </table>
+                        {nextCursor && (
+                            <button
+                                onClick={() => fetchUsers(nextCursor)}
+                                className="w-full py-4 border-t border-white/5 text-[10px] font-black text-gray-500 hover:text-white uppercase tracking-widest transition-colors"
+                            >
+                                Carregar mais
+                            </button>
+                        )}
                     </div>
                 </div>
             </div>
@@ -8,19 +8,28 @@ import { Trash2, ExternalLink } from 'lucide-react';
 const History = () => {
     const [simulations, setSimulations] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const navigate = useNavigate();
 
-    const fetchSimulations = async () => {
+    const fetchSimulations = async (cursor = null) => {
         try {
-            const response = await api.get('/simulations/me');
-            setSimulations(response.data);
+            const response = await api.get('/simulations/me', { params: cursor ? { cursor } : {} });
+            setSimulations(prev => cursor ? [...prev, ...response.data] : response.data);
+            setNextCursor(response.headers['x-next-cursor'] || null);
         } catch (err) {
             console.error("Failed to fetch history:", err);
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     };
 
+    const handleLoadMore = () => {
+        setLoadingMore(true);
+        fetchSimulations(nextCursor);
+    };
+
     useEffect(() => {
         fetchSimulations();
     }, []);
@@ -103,6 +112,15 @@ const History = () => {
                             </div>
                         </Card>
                     ))}
+                    {nextCursor && (
+                        <button
+                            onClick={handleLoadMore}
+                            disabled={loadingMore}
+                            className="w-full p-3 bg-[#1E1E1E] hover:bg-[#2A2A2A] border border-[#333] rounded-xl text-gray-300 text-xs font-bold uppercase transition disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    )}
                 </div>
             )}
         </DashboardLayout>